@@ -0,0 +1,2 @@
+#!/bin/bash
+python ./bench_versions.py
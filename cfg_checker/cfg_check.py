@@ -46,6 +46,12 @@ def config_check_entrypoint():
         help="Filename with nodes to skip. Note: use fqdn node names."
     )
 
+    parser.add_argument(
+        '--refresh-inventory',
+        action='store_true', default=False,
+        help="Do not use saved node inventory, collect it from salt"
+    )
+
     subparsers = parser.add_subparsers(dest='command')
 
     # create parsers
@@ -73,6 +79,7 @@ def config_check_entrypoint():
 
     # Pass externally configured values
     config.ssh_uses_sudo = args.sudo
+    config.refresh_inventory = args.refresh_inventory
 
     # Handle options
     if args.debug:
@@ -79,6 +79,11 @@ def execute_command(args, command):
 
 def cli_command(_title, _name):
     my_parser = MyParser(_title)
+    my_parser.add_argument(
+        '--refresh-inventory',
+        action='store_true', default=False,
+        help="Do not use saved node inventory, collect it from salt"
+    )
     parsers[_name](my_parser)
 
     # parse arguments
@@ -98,6 +103,7 @@ def cli_command(_title, _name):
 
     # force use of sudo
     config.ssh_uses_sudo = True
+    config.refresh_inventory = args.refresh_inventory
 
     # Execute the command
     result = execute_command(args, _name)
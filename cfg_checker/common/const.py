@@ -90,11 +90,20 @@ repo_types = {
     "uknown": "No specific description available"
 }
 
-_repos_info_archive = "repo.info.tgz"
-_repos_versions_archive = "repo.versions.tgz"
-_pkg_desc_archive = "pkg.descriptions.tgz"
+_repos_info_archive = "repo.info.zip"
+_repos_versions_archive = "repo.versions.zip"
+_pkg_desc_archive = "pkg.descriptions.zip"
+_http_cache_filename = "http.cache.json"
+_versions_store_filename = "versions.sqlite"
+_versions_cache_filename = "versions.cache"
 
 _repos_index_filename = "repoindex.json"
+_repos_hashes_filename = "repohashes.json"
 _mainteiners_index_filename = "mainteiners.json"
 _mirantis_versions_filename = "mirantis_v.json"
 _other_versions_filename = "other_v.json"
+_pkg_tags_filename = "pkgtags.json"
+
+# node-side scripts may return gzipped and base64 encoded output
+# framing: '<header> <raw_size> <packed_size>\n<base64 payload>'
+_compressed_output_header = "#cfg-checker-gzip-b64"
@@ -95,6 +95,33 @@ def get_gzipped_file(url):
         return gz.read()
 
 
+def gunzip_lines(chunks):
+    """Decompresses gzipped data chunks on the fly
+    and yields decoded lines
+    """
+    import zlib
+    # gzip header and trailer handled by zlib with this wbits
+    _wbits = zlib.MAX_WBITS | 16
+    _gz = zlib.decompressobj(_wbits)
+    _tail = b""
+    for _chunk in chunks:
+        _data = _gz.decompress(_chunk)
+        # concatenated gzip members, start over on the next one
+        while _gz.unused_data:
+            _next = _gz.unused_data
+            _data += _gz.flush()
+            _gz = zlib.decompressobj(_wbits)
+            _data += _gz.decompress(_next)
+        _lines = (_tail + _data).split(b"\n")
+        # last one is not complete yet
+        _tail = _lines.pop()
+        for _line in _lines:
+            yield _line.rstrip(b"\r").decode("utf-8")
+    _tail += _gz.flush()
+    if _tail:
+        yield _tail.rstrip(b"\r").decode("utf-8")
+
+
 def ensure_folder_exists(_folder):
     if not os.path.exists(_folder):
         # it is not exists, create it
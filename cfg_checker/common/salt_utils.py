@@ -6,6 +6,7 @@ import os
 import time
 
 import requests
+from requests.adapters import HTTPAdapter
 
 from cfg_checker.common import config, logger, logger_cli
 from cfg_checker.common.exception import InvalidReturnException, SaltException
@@ -106,9 +107,104 @@ class SaltRest(object):
     }
 
     def __init__(self):
-        self._token = self._login()
+        self._init_session()
+        self._token = self._load_token()
+        if not self._token:
+            self._token = self._login()
         self.last_response = None
 
+    def _load_token(self):
+        """Loads token saved by previous run, if it is not expiring yet
+
+        :return: token string or None
+        """
+        _file = config.salt_token_file
+        if not os.path.isfile(_file):
+            return None
+        try:
+            with open(_file) as _f:
+                _cached = json.load(_f)
+            _uri = _cached.get('uri')
+            _user = _cached.get('user')
+            _response = _cached['response']
+            _expiring = _response['expire'] < time.time() + 300
+            _token = _response['token']
+        except (IOError, ValueError, KeyError, TypeError, AttributeError):
+            # broken or old format file, new token will replace it
+            logger.debug("# Failed to load cached token from '{}'".format(
+                _file
+            ))
+            return None
+        # token should be for the same master and user
+        if _uri != self.uri or _user != config.salt_user:
+            return None
+        # if token will expire in 5 min, do not use it
+        elif _expiring:
+            return None
+        else:
+            logger.debug("# Using cached token from '{}'".format(_file))
+            self._auth['response'] = _response
+            self.default_headers['X-Auth-Token'] = _token
+            return _token
+
+    def _save_token(self):
+        _file = config.salt_token_file
+        _cached = {
+            'uri': self.uri,
+            'user': config.salt_user,
+            'response': self._auth['response']
+        }
+        try:
+            # token file is readable only by the owner
+            _fd = os.open(_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            os.chmod(_file, 0o600)
+            with os.fdopen(_fd, 'w') as _f:
+                json.dump(_cached, _f)
+        except (IOError, OSError) as e:
+            logger.debug("# Failed to save token to '{}': {}".format(
+                _file,
+                e.strerror
+            ))
+
+    def _init_session(self):
+        # all calls go through single keep-alive session,
+        # so TCP connections to salt-api are pooled and reused
+        self._session = requests.Session()
+        self._adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=config.salt_pool_size
+        )
+        self._session.mount("http://", self._adapter)
+        self._session.mount("https://", self._adapter)
+
+    @staticmethod
+    def _get_timeout(timeout):
+        # per-call timeout overides configured (connect, read) pair
+        if timeout is not None:
+            return timeout
+        else:
+            return (config.salt_connect_timeout, config.salt_read_timeout)
+
+    def get_connection_stats(self):
+        """Counts requests served by the session pool
+        and how many of them needed a new connection
+
+        :return: dict with 'requests', 'new' and 'reused' counters
+        """
+        _requests = _new = 0
+        _pools = self._adapter.poolmanager.pools
+        for _key in _pools.keys():
+            _pool = _pools[_key]
+            if _pool is None:
+                continue
+            _requests += _pool.num_requests
+            _new += _pool.num_connections
+        return {
+            "requests": _requests,
+            "new": _new,
+            "reused": _requests - _new
+        }
+
     def get(
         self,
         path='',
@@ -122,14 +218,21 @@ class SaltRest(object):
             headers,
             cookies
         ))
-        return requests.get(
+        return self._session.get(
             _path,
             headers=headers,
             cookies=cookies,
-            timeout=timeout
+            timeout=self._get_timeout(timeout)
         )
 
-    def post(self, data, path='', headers=default_headers, cookies=None):
+    def post(
+        self,
+        data,
+        path='',
+        headers=default_headers,
+        cookies=None,
+        timeout=None
+    ):
         if data is None:
             data = {}
         _path = os.path.join(self.uri, path)
@@ -145,11 +248,12 @@ class SaltRest(object):
                 _data
             )
         )
-        return requests.post(
-            os.path.join(self.uri, path),
+        return self._session.post(
+            _path,
             headers=headers,
             json=data,
-            cookies=cookies
+            cookies=cookies,
+            timeout=self._get_timeout(timeout)
         )
 
     def _login(self):
@@ -172,6 +276,7 @@ class SaltRest(object):
             self._auth['cookies'] = _response.cookies
             self.default_headers['X-Auth-Token'] = \
                 self._auth['response']['token']
+            self._save_token()
             return self._auth['response']['token']
         else:
             raise EnvironmentError(
@@ -185,6 +290,11 @@ class SaltRest(object):
 
         _method = getattr(self, fn)
         _response = _method(*args, **kwargs)
+        if _response.status_code == 401:
+            # cached token might be revoked on master, login and retry
+            logger.debug("# Token not accepted, logging in again")
+            self._auth['response']['X-Auth-Token'] = self._login()
+            _response = _method(*args, **kwargs)
         self.last_response = _response
         _content = "..."
         _len = len(_response.content)
@@ -198,6 +308,12 @@ class SaltRest(object):
                 _content
             )
         )
+        logger.debug(
+            "# Connections: {requests} requests, "
+            "{new} new, {reused} reused".format(
+                **self.get_connection_stats()
+            )
+        )
         if _response.ok:
             return _response.json()['return']
         else:
@@ -214,9 +330,11 @@ class SaltRemote(SaltRest):
 
     def __init__(self):
         super(SaltRemote, self).__init__()
+        # minions targeted by async jobs, jid -> list
+        self._jobs = {}
 
-    def cmd(
-            self,
+    @staticmethod
+    def lowstate(
             tgt,
             fun,
             param=None,
@@ -226,6 +344,10 @@ class SaltRemote(SaltRest):
             tgt_type=None,
             timeout=None
     ):
+        """Creates lowstate chunk to be posted to salt-api
+
+        :return: dict with salt function call
+        """
         _timeout = timeout if timeout is not None else config.salt_timeout
         _payload = {
             'fun': fun,
@@ -243,15 +365,166 @@ class SaltRemote(SaltRest):
         if kwarg:
             _payload['kwarg'] = kwarg
 
-        _response = self.salt_request('post', [_payload])
-        if isinstance(_response, list):
-            return _response[0]
+        return _payload
+
+    def multi_cmd(self, lowstates):
+        """Sends all of the lowstate chunks in a single salt-api request
+
+        :return: list of returns in the same order as lowstates supplied
+        """
+        _response = self.salt_request('post', lowstates)
+        if isinstance(_response, list) and len(_response) == len(lowstates):
+            return _response
         else:
             raise EnvironmentError(
                 "# Unexpected response from from salt-api/LocalClient: "
                 "{}".format(_response)
             )
 
+    def cmd(
+            self,
+            tgt,
+            fun,
+            param=None,
+            client='local',
+            kwarg=None,
+            expr_form=None,
+            tgt_type=None,
+            timeout=None
+    ):
+        return self.multi_cmd([self.lowstate(
+            tgt,
+            fun,
+            param=param,
+            client=client,
+            kwarg=kwarg,
+            expr_form=expr_form,
+            tgt_type=tgt_type,
+            timeout=timeout
+        )])[0]
+
+    def cmd_async(
+            self,
+            tgt,
+            fun,
+            param=None,
+            kwarg=None,
+            expr_form=None,
+            tgt_type=None
+    ):
+        """Submits a job using 'local_async' client and returns at once
+
+        :return: jid of the job or None if no minions targeted
+        """
+        _payload = self.lowstate(
+            tgt,
+            fun,
+            param=param,
+            client='local_async',
+            kwarg=kwarg,
+            expr_form=expr_form,
+            tgt_type=tgt_type
+        )
+
+        _response = self.salt_request('post', [_payload])
+        if not isinstance(_response, list):
+            raise EnvironmentError(
+                "# Unexpected response from from salt-api/LocalClient: "
+                "{}".format(_response)
+            )
+        elif not _response[0]:
+            # empty dict returned when there is no minions matched
+            return None
+        else:
+            _jid = _response[0]['jid']
+            self._jobs[_jid] = _response[0]['minions']
+            logger.debug(
+                "# Job {} submitted for {} minions".format(
+                    _jid,
+                    len(self._jobs[_jid])
+                )
+            )
+            return _jid
+
+    def lookup_jid(self, jid):
+        return self.run('jobs.lookup_jid', kwarg={'jid': jid})
+
+    def list_job(self, jid):
+        return self.run('jobs.list_job', kwarg={'jid': jid})
+
+    def find_job(self, nodes, jid):
+        """Asks minions if they are still running the job
+
+        :return: list of minions running it
+        """
+        _r = self.cmd(
+            self.compound_string_from_list(nodes),
+            'saltutil.find_job',
+            param=jid,
+            expr_form='compound'
+        )
+        return [_m for _m, _v in _r.items() if _v]
+
+    def iter_jid_results(self, jid, timeout=None, interval=2):
+        """Polls job returns using runner client
+        and hands them over per minion as soon as they arrive.
+
+        Each 'jobs.lookup_jid' call transfers all of the returns
+        collected so far, so it is made only when some minions are
+        done with the job since the last one. Minions are asked if
+        they still run the job on each poll, which is cheap. Polling
+        stops when all targeted minions returned, or when none of
+        them has been running the job for the timeout, like
+        LocalClient does
+
+        :return: generator of (minion, result) tuples
+        """
+        if jid is None:
+            return
+        _timeout = timeout if timeout is not None else config.salt_timeout
+        _deadline = time.time() + int(_timeout)
+        if jid in self._jobs:
+            _minions = set(self._jobs.pop(jid))
+        else:
+            # job submitted elsewhere, get targeted minions from master
+            _minions = set(self.list_job(jid).get('Minions', []))
+        _returned = set()
+        # minions not running the job at the last lookup
+        _checked = set()
+        _lookup = True
+        _last = False
+        while True:
+            if _lookup:
+                _r = self.lookup_jid(jid)
+                if isinstance(_r, dict):
+                    for _minion, _value in _r.items():
+                        if _minion not in _returned:
+                            _returned.add(_minion)
+                            yield _minion, _value
+            _pending = _minions - _returned
+            if not _pending or _last:
+                if _pending:
+                    logger.debug(
+                        "# Job {}: {} minions not returned".format(
+                            jid,
+                            len(_pending)
+                        )
+                    )
+                break
+            time.sleep(interval)
+            _running = set(self.find_job(list(_pending), jid))
+            if _running:
+                # minions still working are waited for
+                _deadline = time.time() + int(_timeout)
+            elif time.time() >= _deadline:
+                # one more poll for returns made before the check
+                _last = True
+            _idle = _pending - _running
+            # minions that started the job later are checked again
+            _checked &= _idle
+            _lookup = _last or bool(_idle - _checked)
+            _checked = _idle
+
     def run(self, fun, kwarg=None):
         _payload = {
             'client': 'runner',
@@ -290,18 +563,41 @@ class SaltRemote(SaltRest):
             raise EnvironmentError(
                 "# Salt Error: '{}'".format(_response['return']))
 
-    def pillar_request(self, node_target, pillar_submodule, argument):
+    def pillar_lowstate(self, node_target, pillar_submodule, argument):
         # example cli: 'salt "ctl01*" pillar.keys rsyslog'
         _type = "compound"
         if isinstance(node_target, list):
             _type = "list"
-        return self.cmd(
+        return self.lowstate(
             node_target,
             "pillar." + pillar_submodule,
             argument,
             expr_form=_type
         )
 
+    def pillar_request(self, node_target, pillar_submodule, argument):
+        return self.multi_cmd([self.pillar_lowstate(
+            node_target,
+            pillar_submodule,
+            argument
+        )])[0]
+
+    def pillar_request_multi(self, pillar_requests):
+        """Batched pillar requests, single salt-api call for all of them
+
+        :param pillar_requests: list of
+            (node_target, pillar_submodule, argument) tuples
+        :return: list of returns in the same order
+        """
+        return self.multi_cmd(
+            [self.pillar_lowstate(*_r) for _r in pillar_requests]
+        )
+
+    def pillar_get_multi(self, node_target, arguments):
+        return self.pillar_request_multi(
+            [(node_target, 'get', _a) for _a in arguments]
+        )
+
     def pillar_keys(self, node_target, argument):
         return self.pillar_request(node_target, 'keys', argument)
 
@@ -353,12 +649,19 @@ class SaltRemote(SaltRest):
             kwarg={'timeout': 10}
         )
 
-    def get_active_nodes(self):
+    def get_active_nodes(self, nodes=None):
         """Used when other minion list metods fail
 
+        :param nodes: list of nodes to ping, default is all of them
         :return: json result from salt test.ping
         """
-        if config.skip_nodes:
+        if nodes:
+            _r = self.cmd(
+                self.compound_string_from_list(nodes),
+                'test.ping',
+                expr_form='compound'
+            )
+        elif config.skip_nodes:
             logger.info("# Nodes to be skipped: {0}".format(config.skip_nodes))
             _r = self.cmd(
                 '* and not ' + list_to_target_string(
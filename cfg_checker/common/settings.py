@@ -41,6 +41,8 @@ class CheckerConfiguration(object):
         self.default_tz = "UTC"
 
         self.pkg_versions_map = 'versions_map.csv'
+        # package versions storage: 'tgz' archive or 'sqlite' database
+        self.pkg_versions_store = os.environ.get('PKG_VERSIONS_STORE', 'tgz')
 
         self.ssh_uses_sudo = False
         self.ssh_key = os.environ.get('SSH_KEY', None)
@@ -51,12 +53,33 @@ class CheckerConfiguration(object):
         self.salt_port = os.environ.get('SALT_PORT', '6969')
         self.salt_user = os.environ.get('SALT_USER', 'salt')
         self.salt_timeout = os.environ.get('SALT_TIMEOUT', 30)
+        # salt-api http session: keep-alive pool size and timeouts
+        self.salt_pool_size = int(os.environ.get('SALT_POOL_SIZE', 4))
+        self.salt_connect_timeout = float(
+            os.environ.get('SALT_CONNECT_TIMEOUT', 10)
+        )
+        _read_timeout = os.environ.get('SALT_READ_TIMEOUT', None)
+        self.salt_read_timeout = float(_read_timeout) \
+            if _read_timeout else None
         self.salt_file_root = os.environ.get('SALT_FILE_ROOT', None)
+        # salt-api token is reused by next runs until it expires
+        self.salt_token_file = os.environ.get(
+            'SALT_TOKEN_FILE',
+            os.path.join(self.working_folder, '.salt_token.json')
+        )
         self.salt_scripts_folder = os.environ.get(
             'SALT_SCRIPTS_FOLDER',
             'cfg_checker_scripts'
         )
 
+        # node inventory snapshot, reused by next runs within TTL
+        self.inventory_file = os.environ.get(
+            'CFG_INVENTORY_FILE',
+            os.path.join(self.working_folder, '.nodes_inventory.json')
+        )
+        self.inventory_ttl = int(os.environ.get('CFG_INVENTORY_TTL', 600))
+        self.refresh_inventory = False
+
         self.skip_nodes = utils.node_string_to_list(os.environ.get(
             'CFG_SKIP_NODES',
             None
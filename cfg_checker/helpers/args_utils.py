@@ -41,6 +41,21 @@ def get_arg(args, str_arg):
         )
 
 
+def get_workers_arg(value):
+    # argparse type for number of workers, should be at least one
+    try:
+        _workers = int(value)
+    except ValueError:
+        _workers = 0
+    if _workers < 1:
+        raise argparse.ArgumentTypeError(
+            "invalid number of workers: '{}', should be 1 or more".format(
+                value
+            )
+        )
+    return _workers
+
+
 def get_path_arg(path):
     if os.path.exists(path):
         return path
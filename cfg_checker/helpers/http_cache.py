@@ -0,0 +1,111 @@
+import json
+import os
+from threading import Lock
+
+from cfg_checker.common import logger, logger_cli
+
+# one cache per file, shared by all users
+_caches = {}
+_caches_lock = Lock()
+
+
+class HttpCache(object):
+    """Conditional GET cache, keeps ETag/Last-Modified per url
+    and, if asked, page body to serve on '304 Not Modified'
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self._lock = Lock()
+        self._entries = {}
+        self._init_stats()
+        if os.path.exists(self.filename):
+            with open(self.filename) as f:
+                self._entries = json.load(f)
+            logger_cli.debug(
+                "... loaded {} http cache entries from '{}'".format(
+                    len(self._entries),
+                    self.filename
+                )
+            )
+
+    def _init_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+    def get(self, get_fn, url, conditional=True, body=False, **kwargs):
+        """Requests url using get_fn with conditional headers
+        if there is a cache entry for it.
+
+        :get_fn: - function to do the request, i.e. requests.get
+        :conditional: - False, when cached copy cannot be used
+        :body: - keep the text of the response to serve it on 304
+        :return: - response and, on 304, cached text (if any)
+        """
+        _entry = self._entries.get(url) if conditional else None
+        if _entry and body and "text" not in _entry:
+            # there is nothing to serve, do full request
+            _entry = None
+        _headers = dict(kwargs.pop("headers", {}))
+        if _entry:
+            if _entry.get("etag"):
+                _headers["If-None-Match"] = _entry["etag"]
+            if _entry.get("last-modified"):
+                _headers["If-Modified-Since"] = _entry["last-modified"]
+        if _headers:
+            kwargs["headers"] = _headers
+        _r = get_fn(url, **kwargs)
+        if _entry and _r.status_code == 304:
+            with self._lock:
+                self.hits += 1
+                self.bytes_saved += _entry.get("size", 0)
+            logger.debug("... [304] '{}'".format(url))
+            return _r, _entry.get("text")
+
+        with self._lock:
+            self.misses += 1
+        if _r.status_code == 200:
+            self._update(url, _r, body)
+        return _r, None
+
+    def _update(self, url, response, body):
+        _h = getattr(response, "headers", None) or {}
+        _etag = _h.get("ETag")
+        _modified = _h.get("Last-Modified")
+        if not _etag and not _modified:
+            # nothing to validate against
+            with self._lock:
+                self._entries.pop(url, None)
+            return
+        _entry = {
+            "etag": _etag,
+            "last-modified": _modified,
+            "size": int(_h.get("Content-Length", 0))
+        }
+        if body:
+            _entry["text"] = response.text
+            _entry["size"] = _entry["size"] or len(response.content)
+        with self._lock:
+            self._entries[url] = _entry
+
+    def save(self):
+        with self._lock:
+            with open(self.filename, "w") as f:
+                json.dump(self._entries, f)
+        logger_cli.info(
+            "-> http cache: {} hits, {} misses, {:.1f} MB saved".format(
+                self.hits,
+                self.misses,
+                self.bytes_saved / 1024.0 / 1024.0
+            )
+        )
+        self._init_stats()
+
+
+def get_http_cache(filename):
+    # single instance per file,
+    # so repos info and versions do not overwrite each other
+    with _caches_lock:
+        if filename not in _caches:
+            _caches[filename] = HttpCache(filename)
+        return _caches[filename]
@@ -0,0 +1,42 @@
+import dbm
+import os
+import shutil
+import tempfile
+import zlib
+
+from cfg_checker.common import logger_cli
+
+
+class KVStore(object):
+    """Temporary on-disk key-value storage for big text values,
+    when only a small portion of them is needed later on.
+    Values are kept compressed, keys are tuples of strings
+    """
+    _filename = "kvstore"
+
+    def __init__(self, folder=None):
+        self._folder = tempfile.mkdtemp(dir=folder)
+        self._db = dbm.open(os.path.join(self._folder, self._filename), 'n')
+        logger_cli.debug(
+            "... created key-value store at '{}'".format(self._folder)
+        )
+
+    @staticmethod
+    def _key(keys):
+        return "\t".join(keys).encode('utf-8')
+
+    def put(self, keys, value):
+        self._db[self._key(keys)] = zlib.compress(value.encode('utf-8'))
+
+    def get(self, keys, default=None):
+        try:
+            return zlib.decompress(self._db[self._key(keys)]).decode('utf-8')
+        except KeyError:
+            return default
+
+    def close(self):
+        # storage is not needed after the run, remove it
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+            shutil.rmtree(self._folder, ignore_errors=True)
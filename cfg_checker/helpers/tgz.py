@@ -1,37 +1,55 @@
 import os
+import shutil
 import tarfile as tarfile
 import tempfile
+import warnings
+import zipfile
+from threading import Lock
 
 from cfg_checker.common import logger_cli
 from cfg_checker.common.exception import ConfigException
 
+# archives opened for reading, shared by all instances in process
+# path -> (mtime and size, zip handle, member names)
+_readers = {}
+_readers_lock = Lock()
+
 
 class TGZFile(object):
+    """Archive of named text members.
+
+    Members are stored in a zip container with per-member compression,
+    so adding or replacing one is an append, not a full rebuild.
+    Replaced members stay in the file until the archive is compacted.
+    Legacy tar.gz archives are migrated on first use.
+    """
     basefile = None
     _labelname = "labelfile"
+    _legacy_ext = ".tgz"
+    # rebuild archive when replaced members take more than this
+    _compact_ratio = 0.5
 
     def __init__(self, _filepath, label=None):
         # Check if this filename exists
         if not os.path.exists(_filepath):
-            # If the archive not exists, create it
-            # simple labelfile for a non-empty archive
-
-            if not label:
-                label = "MCP Checker TGZ file"
-
-            with tempfile.TemporaryFile() as _tempfile:
-                _tempfile.write(label.encode('utf-8'))
-                _tempfile.flush()
-                _tempfile.seek(0)
-                # create tgz
-                with tarfile.open(_filepath, "w:gz") as tgz:
-                    _info = tgz.gettarinfo(
-                        arcname=self._labelname,
-                        fileobj=_tempfile
-                    )
-                    tgz.addfile(_info, fileobj=_tempfile)
+            _legacy = os.path.splitext(_filepath)[0] + self._legacy_ext
+            if _legacy != _filepath and os.path.isfile(_legacy) and \
+                    tarfile.is_tarfile(_legacy):
+                # previous tar.gz archive found, take everything from it
+                self._migrate(_legacy, _filepath)
+            else:
+                # If the archive not exists, create it
+                # simple labelfile for a non-empty archive
+                if not label:
+                    label = "MCP Checker TGZ file"
+                with zipfile.ZipFile(
+                    _filepath,
+                    "w",
+                    compression=zipfile.ZIP_DEFLATED
+                ) as zf:
+                    zf.writestr(self._labelname, label)
                 logger_cli.debug("... created file '{}'".format(_filepath))
-                self.basefile = _filepath
+            self.basefile = _filepath
 
         elif not os.path.isfile(_filepath):
             # if path exists, and it is not a file
@@ -40,36 +58,80 @@ class TGZFile(object):
                     _filepath
                 )
             )
-        elif not tarfile.is_tarfile(_filepath):
-            # if file exists, and it is not a tar file
+        elif zipfile.is_zipfile(_filepath):
+            self.basefile = _filepath
+        elif tarfile.is_tarfile(_filepath):
+            # tar.gz archive under the same name, convert it in place
+            _fd, _tmp = tempfile.mkstemp(
+                dir=os.path.dirname(os.path.abspath(_filepath))
+            )
+            os.close(_fd)
+            self._migrate(_filepath, _tmp)
+            shutil.copymode(_filepath, _tmp)
+            os.replace(_tmp, _filepath)
+            self.basefile = _filepath
+        else:
+            # if file exists, and it is not an archive
             raise ConfigException(
-                "Supplied file of '{}' is not a TAR stream".format(
+                "Supplied file of '{}' is not a ZIP or TAR archive".format(
                     _filepath
                 )
             )
-        else:
-            self.basefile = _filepath
+
+    @staticmethod
+    def _migrate(src, dst):
+        logger_cli.info(
+            "-> migrating archive '{}' -> '{}'".format(src, dst)
+        )
+        with tarfile.open(src, "r:gz") as tgz, \
+                zipfile.ZipFile(
+                    dst,
+                    "w",
+                    compression=zipfile.ZIP_DEFLATED
+                ) as zf:
+            for _member in tgz.getmembers():
+                if not _member.isfile():
+                    continue
+                zf.writestr(
+                    _member.name.rsplit('/', 1)[-1],
+                    tgz.extractfile(_member).read()
+                )
+
+    def _get_reader(self):
+        # archive is opened once and reopened only if it has changed
+        _st = os.stat(self.basefile)
+        _stamp = (_st.st_mtime_ns, _st.st_size)
+        _path = os.path.abspath(self.basefile)
+        with _readers_lock:
+            _reader = _readers.get(_path)
+            if _reader and _reader[0] == _stamp:
+                return _reader
+            if _reader:
+                _reader[1].close()
+            _zf = zipfile.ZipFile(self.basefile)
+            # replaced members are listed once
+            _reader = (_stamp, _zf, list(dict.fromkeys(_zf.namelist())))
+            _readers[_path] = _reader
+            return _reader
+
+    def _drop_reader(self):
+        with _readers_lock:
+            _reader = _readers.pop(os.path.abspath(self.basefile), None)
+            if _reader:
+                _reader[1].close()
 
     def get_file(self, name, decode=False):
         if self.has_file(name):
-            with tarfile.open(self.basefile, "r:gz") as tgz:
-                _tgzitem = tgz.extractfile(tgz.getmember(name))
-                if decode:
-                    return _tgzitem.read().decode('utf-8') 
-                else:
-                    return _tgzitem.read()
+            # last member with this name is the actual one
+            _buf = self._get_reader()[1].read(name)
+            if decode:
+                return _buf.decode('utf-8')
+            else:
+                return _buf
         else:
             return None
 
     def add_file(self, name, buf=None, replace=False):
-        _files = []
-        with tarfile.open(self.basefile) as r:
-            _files = r.getnames()
-            _exists = name in _files
-            if _exists and not replace:
-                # file exists and replace flag is not set
-                return False
-
         # check if there is work to do
         if not buf and not os.path.exists(name):
             # Nothing to do: no buffer or file to add
@@ -79,66 +141,75 @@ class TGZFile(object):
             return False
 
         _a = "replace" if replace else "add"
+        if buf:
+            _size = len(buf)
+        else:
+            _size = os.path.getsize(name)
         logger_cli.debug("... about to {} '{}' ({:.2f}MB) -> '{}'".format(
             _a,
             name,
-            float(len(buf))/1024/1024,
+            float(_size)/1024/1024,
             self.basefile
         ))
 
-        # unzip tar, add file, zip it back
-        _tmpdir = tempfile.mkdtemp()
-        logger_cli.debug("... created tempdir '{}'".format(_tmpdir))
-        # extract them
-        _files = []
-        with tarfile.open(self.basefile) as r:
-            # all names extracted
-            _files = r.getnames()
-            # extract 'em
-            logger_cli.debug("... extracting contents")
-            r.extractall(_tmpdir)
-
-        # create file
-        if buf:
-            _p = os.path.join(_tmpdir, name)
-            logger_cli.debug("... writing new file to '{}'".format(
-                _p
-            ))
-            if not _exists or replace:
-                with open(_p, "w") as w:
-                    w.write(buf)
-            if not _exists:
-                _files.append(name)
-        # create the archive
-        logger_cli.debug("... rebuilding archive")
-        with tarfile.open(self.basefile, "w:gz") as tgz:
-            for _file in _files:
-                _p = os.path.join(_tmpdir, _file)
-                tgz.add(_p, arcname=_file)
-                os.remove(_p)
-        os.rmdir(_tmpdir)
+        # append member, previous one with the same name is shadowed
+        self._drop_reader()
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", "Duplicate name")
+            with zipfile.ZipFile(
+                self.basefile,
+                "a",
+                compression=zipfile.ZIP_DEFLATED
+            ) as zf:
+                if buf:
+                    zf.writestr(name, buf)
+                else:
+                    zf.write(name, arcname=os.path.basename(name))
+        self._compact_if_needed()
         return True
 
+    def _compact_if_needed(self):
+        _infos = self._get_reader()[1].infolist()
+        _live = {}
+        _stale = 0
+        for _info in _infos:
+            if _info.filename in _live:
+                _stale += _live[_info.filename].compress_size
+            _live[_info.filename] = _info
+        _total = sum(_i.compress_size for _i in _infos)
+        if not _stale or _stale < _total * self._compact_ratio:
+            return
+        logger_cli.debug(
+            "... compacting '{}', {:.2f}MB stale".format(
+                self.basefile,
+                float(_stale)/1024/1024
+            )
+        )
+        _fd, _tmp = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(self.basefile))
+        )
+        os.close(_fd)
+        _src = self._get_reader()[1]
+        with zipfile.ZipFile(
+            _tmp,
+            "w",
+            compression=zipfile.ZIP_DEFLATED
+        ) as dst:
+            for _info in _live.values():
+                dst.writestr(_info.filename, _src.read(_info))
+        shutil.copymode(self.basefile, _tmp)
+        os.replace(_tmp, self.basefile)
+        self._drop_reader()
+
     def list_files(self):
-        # get names
-        with tarfile.open(self.basefile, "r:gz") as tgz:
-            _names = tgz.getnames()
-        # filter filenames only, skip path
-        if any(['/' in _n for _n in _names]):
-            _n = []
-            for f in _names:
-                if '/' in f:
-                    _n.append(f.rsplit('/', 1)[1])
-                else:
-                    _n.append(f)
-            _names = _n
+        _names = list(self._get_reader()[2])
         # remove label file from output
         if self._labelname in _names:
             _names.remove(self._labelname)
         return _names
 
     def has_file(self, name):
-        if name in self.list_files():
+        if name != self._labelname and name in self._get_reader()[2]:
             logger_cli.debug("... '{}' has '{}'".format(self.basefile, name))
             return True
         else:
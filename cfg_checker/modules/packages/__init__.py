@@ -1,5 +1,5 @@
 from cfg_checker.helpers import args_utils
-from cfg_checker.modules.packages.repos import RepoManager
+from cfg_checker.modules.packages.repos import RepoManager, ReposInfo
 
 from . import checker
 
@@ -76,6 +76,47 @@ def init_parser(_parser):
         action="store_true", default=False,
         help="Save pkg descriptions while parsing"
     )
+    pkg_repos.add_argument(
+        '--crawl-workers',
+        metavar='crawl_workers', type=args_utils.get_workers_arg, default=1,
+        help="Number of threads listing mirror pages "
+             "while building repos info. Default: 1"
+    )
+    pkg_repos.add_argument(
+        '--crawl-rate',
+        metavar='crawl_rate', type=float, default=0,
+        help="Max mirror page requests per second per host "
+             "while building repos info. Default: 0, no limit"
+    )
+    pkg_repos.add_argument(
+        '--discovery',
+        choices=["listing", "release"], default="listing",
+        help="How to find Packages.gz files while building repos info: "
+             "walk mirror folders or read suites' Release files. "
+             "Default: listing"
+    )
+    pkg_repos.add_argument(
+        '--fetch-workers',
+        metavar='fetch_workers', type=args_utils.get_workers_arg, default=1,
+        help="Number of threads downloading Packages.gz files. "
+             "Default: 1, files are streamed and parsed one by one"
+    )
+    pkg_repos.add_argument(
+        '--parse-workers',
+        metavar='parse_workers', type=args_utils.get_workers_arg, default=1,
+        help="Number of processes parsing downloaded Packages.gz files. "
+             "Default: 1"
+    )
+    pkg_repos.add_argument(
+        '--store-import',
+        action="store_true", default=False,
+        help="Import versions from archive into SQLite store and exit"
+    )
+    pkg_repos.add_argument(
+        '--store-export',
+        action="store_true", default=False,
+        help="Export versions from SQLite store into archive and exit"
+    )
     pkg_show = pkg_subparsers.add_parser(
         'show',
         help="Show package history from the map"
@@ -134,7 +175,24 @@ def do_versions(args):
     :return: - no return value
     """
     # Get the list of tags for the url
-    r = RepoManager()
+    r = RepoManager(
+        info_class=ReposInfo(
+            workers=args.crawl_workers,
+            rate_limit=args.crawl_rate,
+            discovery=args.discovery
+        ),
+        fetch_workers=args.fetch_workers,
+        parse_workers=args.parse_workers,
+        store="sqlite" if args.store_import or args.store_export else None
+    )
+    if args.store_import:
+        # new store is filled from archive when manager is created
+        if not r.store_imported:
+            r.import_versions_store()
+        return
+    if args.store_export:
+        r.export_versions_store()
+        return
     if args.list_tags:
         r.action_for_tag(args.url, args.tag, action="list")
         return
@@ -162,8 +220,8 @@ def do_versions(args):
 def do_show(args):
     """Shows package (or multiple) history across parsed tags
     """
-    # Init manager
-    r = RepoManager()
+    # Init manager, versions are loaded per package
+    r = RepoManager(lazy=True)
     # show packages
     for p in args.args:
         r.show_package(p)
@@ -172,8 +230,8 @@ def do_show(args):
 def do_show_app(args):
     """Shows packages for app
     """
-    # Init manager
-    r = RepoManager()
+    # Init manager, versions are loaded per app
+    r = RepoManager(lazy=True)
     # show packages
     for a in args.args:
         r.show_app(a)
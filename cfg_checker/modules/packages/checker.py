@@ -4,6 +4,7 @@ from cfg_checker.common import const, logger_cli
 from cfg_checker.common.exception import ConfigException
 from cfg_checker.common.other import merge_dict
 from cfg_checker.helpers.console_utils import Progress
+from cfg_checker.helpers.kv_store import KVStore
 from cfg_checker.modules.packages.repos import RepoManager
 from cfg_checker.nodes import salt_master
 from cfg_checker.reports import reporter
@@ -41,6 +42,8 @@ class CloudPackageChecker(object):
 
         self.force_tag = force_tag
         self.exclude_keywords = exclude_keywords
+        # raw 'apt-cache policy' texts, (node, package) -> text
+        self._raw_store = None
 
     @staticmethod
     def presort_packages(all_packages, full=None):
@@ -189,6 +192,30 @@ class CloudPackageChecker(object):
 
         return _data
 
+    def _save_installed_packages(self, node, text):
+        # parse script output and save it as soon as node returns it
+        _dict = {}
+        if text:
+            try:
+                _dict = json.loads(text[text.find('{'):])
+            except ValueError:
+                logger_cli.info("... no JSON for '{}'".format(
+                    node
+                ))
+                logger_cli.debug(
+                    "ERROR:\n{}\n".format(text[:text.find('{')])
+                )
+        # raw texts are needed only for packages shown in report
+        # so move them out of the way
+        for _name, _value in _dict.items():
+            self._raw_store.put((node, _name), _value.pop('raw', ''))
+        if node in salt_master.nodes:
+            salt_master.nodes[node]['packages'] = _dict
+            logger_cli.debug("... {} has {} packages installed".format(
+                node,
+                len(_dict.keys())
+            ))
+
     def collect_installed_packages(self):
         """
         Collect installed packages on each node
@@ -197,31 +224,19 @@ class CloudPackageChecker(object):
         :return: none
         """
         logger_cli.info("# Collecting installed packages")
-        salt_master.prepare_script_on_active_nodes("pkg_versions.py")
-        _result = salt_master.execute_script_on_active_nodes("pkg_versions.py")
-
+        if self._raw_store:
+            self._raw_store.close()
+        self._raw_store = KVStore()
         for key in salt_master.nodes.keys():
-            # due to much data to be passed from salt, it is happening in order
-            if key in _result and _result[key]:
-                _text = _result[key]
-                try:
-                    _dict = json.loads(_text[_text.find('{'):])
-                except ValueError:
-                    logger_cli.info("... no JSON for '{}'".format(
-                        key
-                    ))
-                    logger_cli.debug(
-                        "ERROR:\n{}\n".format(_text[:_text.find('{')])
-                    )
-                    _dict = {}
-
-                salt_master.nodes[key]['packages'] = _dict
-            else:
-                salt_master.nodes[key]['packages'] = {}
-            logger_cli.debug("... {} has {} packages installed".format(
-                key,
-                len(salt_master.nodes[key]['packages'].keys())
-            ))
+            salt_master.nodes[key]['packages'] = {}
+        salt_master.prepare_script_on_active_nodes("pkg_versions.py")
+        # nodes output is parsed as it arrives, slow nodes do not block
+        # output is compressed on nodes and unpacked on arrival
+        salt_master.execute_script_on_active_nodes(
+            "pkg_versions.py",
+            args=["--compress"],
+            callback=self._save_installed_packages
+        )
         logger_cli.info("-> Done")
 
     def collect_packages(self):
@@ -249,6 +264,33 @@ class CloudPackageChecker(object):
             )
         )
 
+        # node attributes for each package, taken from the first node
+        # it is found on, releases are searched for these
+        # skipped and down nodes have no packages and no linux attributes
+        _pkg_nodes = {}
+        for node_name, node_value in salt_master.nodes.items():
+            for _name in node_value['packages']:
+                if _name not in _pkg_nodes:
+                    _pkg_nodes[_name] = (
+                        node_value['linux_codename'],
+                        node_value['linux_arch']
+                    )
+        logger_cli.info(
+            "-> searching release versions for {} packages".format(
+                len(_pkg_nodes)
+            )
+        )
+        # get versions for tag, Openstack release and repo headers
+        # excluding 'nightly' repos by default
+        # if there is a forced tag = use it, if nothing found,
+        # repeat search using normal tags
+        _releases = self.rm.get_release_versions(
+            _pkg_nodes,
+            _t,
+            _os,
+            self.exclude_keywords
+        )
+
         # Progress class
         _progress = Progress(len(salt_master.nodes.keys()))
         _progress_index = 0
@@ -276,80 +318,9 @@ class CloudPackageChecker(object):
                 # Process package description and release version
                 # at a first sight
                 if _name not in _all_packages:
-                    # get node attributes
-                    _linux = salt_master.nodes[node_name]['linux_codename']
-                    _arch = salt_master.nodes[node_name]['linux_arch']
-                    # get versions for tag, Openstack release and repo headers
-                    # excluding 'nightly' repos by default
-                    _r = {}
-                    # if there is a forced tag = use it
-                    if self.force_tag:
-                        _r = self.rm.get_filtered_versions(
-                            _name,
-                            tag=self.force_tag,
-                            include=[_os, _linux, _arch],
-                            exclude=self.exclude_keywords
-                        )
-                        # if nothing found, look everywhere
-                        # but with no word 'openstack'
-                        if not _r:
-                            _r = self.rm.get_filtered_versions(
-                                _name,
-                                tag=self.force_tag,
-                                include=[_linux, _arch],
-                                exclude=self.exclude_keywords + ['openstack']
-                            )
-                    # if nothing is found at this point,
-                    # repeat search using normal tags
-                    if not _r:
-                        _r = self.rm.get_filtered_versions(
-                            _name,
-                            tag=_mcp,
-                            include=[_os, _linux, _arch],
-                            exclude=self.exclude_keywords
-                        )
-                    # Once again, if nothing found, look everywhere
-                    if not _r:
-                        _r = self.rm.get_filtered_versions(
-                            _name,
-                            tag=_mcp,
-                            include=[_linux, _arch],
-                            exclude=self.exclude_keywords + ['openstack']
-                        )
-                    # repack versions in flat format
-                    _vs = {}
-                    _sections = {}
-                    _apps = {}
-                    for s, apps in _r.items():
-                        for a, versions in apps.items():
-                            for v, repos in versions.items():
-                                for repo in repos:
-                                    if v not in _vs:
-                                        _vs[v] = []
-                                    _vs[v].append(repo)
-                                    if v not in _sections:
-                                        _sections[v] = []
-                                    _sections[v].append(s)
-                                    if v not in _apps:
-                                        _apps[v] = []
-                                    _apps[v].append(a)
-                    # search for the newest version among filtered
-                    _r_desc = []
-                    _vs_keys = iter(_vs.keys())
-                    # get next version, if any
-                    try:
-                        _newest = DebianVersion(next(_vs_keys))
-                    except StopIteration:
-                        _newest = DebianVersion('')
-                    # iterate others, if any
-                    for v in _vs_keys:
-                        _this = DebianVersion(v)
-                        if _this > _newest:
-                            _newest = _this
-                    _release = _newest
-                    # Get best description for the package
-                    if _release.version != 'n/a':
-                        _r_desc = _vs[_release.version]
+                    _rel = _releases[_name]
+                    _release = _rel["r"]
+                    _r_desc = _rel["repos"]
                     # preload special description
                     if _desc[_name]:
                         _pkg_desc = _desc[_name]
@@ -359,11 +330,9 @@ class CloudPackageChecker(object):
                     # Check if we can provide better from the package
                     if _release.version != 'n/a':
                         if not _pkg_desc['section']:
-                            _pkg_desc['section'] = \
-                                "/".join(_sections[_release.version])
+                            _pkg_desc['section'] = "/".join(_rel["sections"])
                         if not _pkg_desc['app']:
-                            _pkg_desc['app'] = \
-                                "/".join(_apps[_release.version])
+                            _pkg_desc['app'] = "/".join(_rel["apps"])
 
                     # Populate package info, once for package
                     _m = _r_desc[0]["maintainer"] if _r_desc else 'n/a'
@@ -400,12 +369,18 @@ class CloudPackageChecker(object):
                 _res[_cmp.status][_cmp.action][node_name] = {
                     'i': _ver_ins,
                     'c': _ver_can,
-                    'res': _cmp,
-                    'raw': _value['raw']
+                    'res': _cmp
                 }
 
         self._packages = _all_packages
         _progress.end()
+        _ci = DebianVersion.cache_info()
+        logger_cli.debug(
+            "... versions parsed: {}, reused: {}".format(
+                _ci.misses,
+                _ci.hits
+            )
+        )
 
     def create_report(self, filename, rtype, full=None):
         """
@@ -429,6 +404,32 @@ class CloudPackageChecker(object):
             "mcp_release": salt_master.mcp_release,
             "openstack_release": salt_master.openstack_release
         }
-        payload.update(self.presort_packages(self._packages, full))
-        _report(payload)
+        try:
+            payload.update(self.presort_packages(self._packages, full))
+            if rtype == 'html':
+                self._load_raw_for_report(payload)
+            _report(payload)
+        finally:
+            # raw texts are not needed after the report, even a failed one
+            if self._raw_store:
+                self._raw_store.close()
+                self._raw_store = None
         logger_cli.info("-> Done")
+
+    def _load_raw_for_report(self, data):
+        # only packages that made it to the report get raw texts
+        _count = 0
+        for _group in ['critical', 'system', 'other', 'unlisted']:
+            for _name, _val in data[_group].items():
+                for _actions in _val['results'].values():
+                    for _nodes in _actions.values():
+                        for _node, _nd in _nodes.items():
+                            if self._raw_store:
+                                _nd['raw'] = self._raw_store.get(
+                                    (_node, _name),
+                                    default=""
+                                )
+                                _count += 1
+                            else:
+                                _nd['raw'] = ""
+        logger_cli.debug("... loaded {} raw package texts".format(_count))
@@ -1,27 +1,47 @@
+import hashlib
 import json
 import os
 import re
-from copy import deepcopy
-
-from cfg_checker.common import logger, logger_cli, nested_set
+import time
+from collections import deque
+from itertools import chain
+from multiprocessing import Pool
+from multiprocessing.dummy import Pool as ThreadPool
+from queue import Queue
+from threading import Lock, Thread
+from urllib.parse import urlparse
+
+from cfg_checker.common import config, logger, logger_cli, nested_set
+from cfg_checker.common.const import _http_cache_filename
 from cfg_checker.common.const import _mainteiners_index_filename
 from cfg_checker.common.const import _mirantis_versions_filename
 from cfg_checker.common.const import _other_versions_filename
 from cfg_checker.common.const import _pkg_desc_archive
+from cfg_checker.common.const import _pkg_tags_filename
+from cfg_checker.common.const import _repos_hashes_filename
 from cfg_checker.common.const import _repos_index_filename
 from cfg_checker.common.const import _repos_info_archive
 from cfg_checker.common.const import _repos_versions_archive
+from cfg_checker.common.const import _versions_cache_filename
+from cfg_checker.common.const import _versions_store_filename
 from cfg_checker.common.const import ubuntu_releases
 from cfg_checker.common.file_utils import ensure_folder_exists
-from cfg_checker.common.file_utils import get_gzipped_file
+from cfg_checker.common.file_utils import gunzip_lines
 from cfg_checker.common.settings import pkg_dir
 from cfg_checker.helpers.console_utils import Progress
+from cfg_checker.helpers.http_cache import get_http_cache
 from cfg_checker.helpers.tgz import TGZFile
+from cfg_checker.modules.packages.store import MIRANTIS, OTHER
+from cfg_checker.modules.packages.store import VersionStore, VersionsCache
+from cfg_checker.modules.packages.versions import DebianVersion
 
 import requests
+from requests.adapters import HTTPAdapter
 from requests.exceptions import ConnectionError
 
 ext = ".json"
+# Release file sections listing index files
+_release_hash_sections = ["MD5Sum:", "SHA1:", "SHA256:", "SHA512:"]
 
 
 def get_tag_label(_tag, parsed=False):
@@ -41,41 +61,102 @@ def get_tag_label(_tag, parsed=False):
     return _label
 
 
-def _get_value_index(_di, value, header=None):
+def _get_value_index(_di, _rev, value, header=None):
     # Mainteiner names often uses specific chars
     # so make sure that value saved is str not str
     # Python2
     # _val = str(value, 'utf-8') if isinstance(value, str) else value
     # Python3 has always utf-8 decoded value
     _val = value
-    if header:
-        try:
-            _ = next(filter(lambda i: _di[i]["header"] == header, _di))
-            # iterator not empty, find index
-            for _k, _v in _di.items():
-                if _v["header"] == header:
-                    _index = _k
-        except StopIteration:
-            _index = str(len(_di.keys()) + 1)
+    # reverse dict holds header (or value) to index mapping
+    _key = header if header else _val
+    try:
+        return _rev[_key]
+    except KeyError:
+        _index = str(len(_di.keys()) + 1)
+        if header:
             _di[_index] = {
                 "header": header,
                 "props": _val
             }
-        finally:
-            return _index
-    else:
-        try:
-            _ = next(filter(lambda i: _di[i] == _val, _di))
-            # iterator not empty, find index
-            for _k, _v in _di.items():
-                if _v == _val:
-                    _index = _k
-        except StopIteration:
-            _index = str(len(_di.keys()) + 1)
+        else:
             # on save, cast it as str
             _di[_index] = _val
-        finally:
-            return _index
+        _rev[_key] = _index
+        return _index
+
+
+def _reverse_index(_di, header=False):
+    # build value to index mapping for the index dict
+    # for the same values the last one wins, as forward search did
+    if header:
+        return {_v["header"]: _k for _k, _v in _di.items()}
+    else:
+        return {_v: _k for _k, _v in _di.items()}
+
+
+def _split_header(header):
+    # keywords of repo header, i.e. 'pike', 'xenial', 'amd64'
+    return frozenset(re.split(r"[\-\_]+", header))
+
+
+def _get_stanzas(lines):
+    # break lines collection into isolated pkg data
+    _desc = {}
+    _key = _value = ""
+    for _line in lines:
+        if not _line:
+            # if the line is empty, pkg data gathered
+            if _desc:
+                yield _desc
+            # clear the data for next pkg
+            _desc = {}
+            _key = _value = ""
+        elif _line.startswith(' '):
+            _desc[_key] += "\n{}".format(_line)
+        else:
+            _key, _value = _line.split(': ', 1)
+            _key = _key.lower()
+
+            _desc[_key] = _value
+    # no empty line at the end
+    if _desc:
+        yield _desc
+
+
+def _get_repo_packages(stanzas, descriptions=False):
+    # compact package data needed for merging,
+    # simple tuples are cheap to pass between processes
+    for _desc in stanzas:
+        if 'source' in _desc:
+            _ap = _desc['source'].lower()
+        else:
+            _ap = "-"
+        yield (
+            _desc['package'],
+            _desc['version'],
+            _desc['md5sum'],
+            _desc['maintainer'],
+            _desc['section'].lower(),
+            _ap,
+            _desc.get('architecture'),
+            _desc if descriptions else None
+        )
+
+
+def _parse_repo_file(args, chunk_size=65536):
+    # parse downloaded Packages file into package list
+    _data, _descriptions = args
+    if _data is None:
+        # not modified since last parsing
+        return None
+    _chunks = (
+        _data[_i:_i + chunk_size] for _i in range(0, len(_data), chunk_size)
+    )
+    return list(_get_repo_packages(
+        _get_stanzas(gunzip_lines(_chunks)),
+        descriptions=_descriptions
+    ))
 
 
 def _safe_load(_f, _a):
@@ -103,6 +184,15 @@ class ReposInfo(object):
 
     def _init_vars(self):
         self.repos = []
+        # listed pages, url -> (dirs, files)
+        self._pages = {}
+        # suite url -> Packages.gz paths from its Release file
+        self._releases = {}
+        # Packages.gz url -> SHA256 from the Release file
+        self._hashes = {}
+        # per-host time of the next allowed request
+        self._host_next = {}
+        self._rate_lock = Lock()
 
     def _init_folders(self, arch_folder=None):
         if arch_folder:
@@ -115,10 +205,31 @@ class ReposInfo(object):
                 _repos_info_archive
             )
 
-    def __init__(self, arch_folder=None):
+    def __init__(
+        self,
+        arch_folder=None,
+        workers=1,
+        rate_limit=0,
+        discovery="listing"
+    ):
         # perform inits
         self._init_vars()
         self._init_folders(arch_folder)
+        # crawler settings, rate limit is requests per second per host
+        self.workers = workers
+        self.rate_limit = rate_limit
+        # 'listing' walks dists folders, 'release' reads Release files
+        self.discovery = discovery
+        # single connection pool shared by all crawler threads
+        self._session = requests.Session()
+        self._session.mount(
+            "http://",
+            HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        )
+        self._session.mount(
+            "https://",
+            HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        )
         self.init_done = True
 
     def __call__(self, *args, **kwargs):
@@ -127,18 +238,47 @@ class ReposInfo(object):
         else:
             return self.__init__(self, *args, **kwargs)
 
-    @staticmethod
-    def _ls_repo_page(url):
+    @property
+    def _http_cache(self):
+        # loaded on first request, not when only archived info is read
+        return get_http_cache(
+            os.path.join(self._arch_folder, _http_cache_filename)
+        )
+
+    def _wait_for_host(self, url):
+        # keep requests to a single host under the rate limit
+        if not self.rate_limit:
+            return
+        _host = urlparse(url).netloc
+        with self._rate_lock:
+            _now = time.time()
+            _next = max(self._host_next.get(_host, 0), _now)
+            self._host_next[_host] = _next + 1.0 / self.rate_limit
+        if _next > _now:
+            time.sleep(_next - _now)
+
+    def _ls_repo_page(self, url):
+        # pages crawled before are not requested again
+        if url in self._pages:
+            return self._pages[url]
         # Yes, this is ugly. But it works ok for small HTMLs.
         _a = "<a"
         _s = "href="
         _e = "\">"
+        self._wait_for_host(url)
         try:
-            page = requests.get(url, timeout=60)
+            page, _text = self._http_cache.get(
+                self._session.get,
+                url,
+                body=True,
+                timeout=60
+            )
         except ConnectionError as e:
-            logger_cli.error("# ERROR: {}".format(e.message))
+            logger_cli.error("# ERROR: {}".format(e))
             return [], []
-        a = page.text.splitlines()
+        if _text is None:
+            _text = page.text
+        a = _text.splitlines()
         # Comprehension for dirs. Anchors for ends with '-'
         _dirs = [l[l.index(_s)+6:l.index(_e)-1]
                  for l in a if l.startswith(_a) and l.endswith('-')]
@@ -146,8 +286,179 @@ class ReposInfo(object):
         _files = [l[l.index(_s)+6:l.index(_e)]
                   for l in a if l.startswith(_a) and not l.endswith('-')]
 
+        self._pages[url] = (_dirs, _files)
         return _dirs, _files
 
+    def _crawl(self, urls, recursive=False):
+        """Lists pages concurrently and keeps them for later use
+
+        Recursive crawl follows the same dirs as search_pkg does.
+        Results are consumed by the usual sequential code,
+        so the order of the data produced does not change.
+        """
+        _queue = Queue()
+        _seen = set()
+        _errors = []
+        _seen_lock = Lock()
+
+        def _put(_url):
+            with _seen_lock:
+                if _url in _seen or _url in self._pages:
+                    return
+                _seen.add(_url)
+            _queue.put(_url)
+
+        def _worker():
+            while True:
+                _url = _queue.get()
+                if _url is None:
+                    _queue.task_done()
+                    return
+                try:
+                    _dirs, _ = self._ls_repo_page(_url)
+                    if recursive:
+                        for _d in _dirs:
+                            # Search only in dists, ignore the rest
+                            if "dists" not in _url and _d != "dists":
+                                continue
+                            _put(_n_url(_url + _d))
+                except Exception as e:
+                    _errors.append(e)
+                finally:
+                    _queue.task_done()
+
+        for _url in urls:
+            _put(_url)
+        _threads = [
+            Thread(target=_worker, daemon=True) for _ in range(self.workers)
+        ]
+        for _t in _threads:
+            _t.start()
+        _queue.join()
+        for _t in _threads:
+            _queue.put(None)
+        for _t in _threads:
+            _t.join()
+        if _errors:
+            raise _errors[0]
+        logger.debug(
+            "... {} pages listed, {} in total".format(
+                len(_seen),
+                len(self._pages)
+            )
+        )
+
+    def _crawl_tags(self, repos, repotgz):
+        # list all of the pages fetch_repos needs, level by level
+        _baseurls = [
+            _repo["baseurl"] for _label, _repo in repos.items()
+            if not repotgz.has_file(_label + ext)
+        ]
+        self._crawl(_baseurls)
+        _roots = []
+        _releases = []
+        for _baseurl in _baseurls:
+            _sub_tags, _ = self._ls_repo_page(_baseurl)
+            for _stag in _sub_tags:
+                if _stag in ubuntu_releases:
+                    _roots.append(_n_url(_baseurl + _stag))
+                else:
+                    _releases.append(_n_url(_baseurl + _stag))
+        self._crawl(_releases)
+        for _u in _releases:
+            _rels, _ = self._ls_repo_page(_u)
+            _roots += [
+                _n_url(_u + _r) for _r in _rels if _r in ubuntu_releases
+            ]
+        if self.discovery == "release":
+            # only suites list and Release files are needed
+            _dists = [_n_url(_r + "dists") for _r in _roots]
+            self._crawl(_dists)
+            _suites = []
+            for _u in _dists:
+                _dirs, _ = self._ls_repo_page(_u)
+                _suites += [_n_url(_u + _d) for _d in _dirs]
+            _pool = ThreadPool(self.workers)
+            try:
+                _pool.map(self._get_release_paths, _suites)
+            finally:
+                _pool.terminate()
+        else:
+            self._crawl(_roots, recursive=True)
+
+    @staticmethod
+    def _parse_release(text):
+        # Release file lists indexes in hash sections as
+        # ' <hash> <size> <path relative to suite>'
+        # returns path -> SHA256, if there is one
+        _paths = {}
+        _section = None
+        for _line in text.splitlines():
+            if not _line.startswith(' '):
+                _section = _line.strip()
+                continue
+            if _section not in _release_hash_sections:
+                continue
+            _fields = _line.split()
+            if len(_fields) == 3 and \
+                    _fields[2].rsplit('/', 1)[-1] == "Packages.gz":
+                if _section == "SHA256:":
+                    _paths[_fields[2]] = _fields[0]
+                else:
+                    _paths.setdefault(_fields[2], None)
+        return _paths
+
+    def _get_release_paths(self, url):
+        # Packages.gz paths from suite's Release (or InRelease) file
+        if url in self._releases:
+            return self._releases[url]
+        _paths = {}
+        for _name in ["Release", "InRelease"]:
+            self._wait_for_host(url + _name)
+            try:
+                _r, _text = self._http_cache.get(
+                    self._session.get,
+                    url + _name,
+                    body=True,
+                    timeout=60
+                )
+            except ConnectionError as e:
+                logger_cli.error("# ERROR: {}".format(e))
+                break
+            if _text is not None:
+                _paths = self._parse_release(_text)
+                break
+            elif _r.status_code == 200:
+                _paths = self._parse_release(_r.text)
+                break
+        else:
+            logger.warning("... no Release file found at '{}'".format(url))
+        self._releases[url] = _paths
+        return _paths
+
+    def search_release(self, url, _list):
+        # Packages.gz files listed in Release files of dists suites
+        _dists = _n_url(url + "dists")
+        _suites, _ = self._ls_repo_page(_dists)
+        for _suite in _suites:
+            _u = _n_url(_dists + _suite)
+            # same order as walking the folders would give
+            _hashes = self._get_release_paths(_u)
+            _paths = sorted(_hashes, key=lambda p: p.split('/'))
+            for _path in _paths:
+                _list.append(_u + _path)
+                if _hashes[_path]:
+                    self._hashes[_u + _path] = _hashes[_path]
+                logger.debug("... [R] '{}'".format(_u + _path))
+
+        return _list
+
+    def _search_packages(self, url):
+        if self.discovery == "release":
+            return self.search_release(url, [])
+        else:
+            return self.search_pkg(url, [])
+
     def search_pkg(self, url, _list):
         # recoursive method to walk dists tree
         _dirs, _files = self._ls_repo_page(url)
@@ -167,7 +478,7 @@ class ReposInfo(object):
         return _list
 
     @staticmethod
-    def _map_repo(_path_list, _r):
+    def _map_repo(_path_list, _r, hashes=None):
         for _pkg_path in _path_list:
             _l = _pkg_path.split('/')
             _kw = _l[_l.index('dists')+1:]
@@ -178,6 +489,9 @@ class ReposInfo(object):
                 "ubuntu-release": _kw[3],
                 "filepath": _pkg_path
             }
+            if hashes and _pkg_path in hashes:
+                # content hash known from the Release file
+                _repo_item["sha256"] = hashes[_pkg_path]
             _r.append(_repo_item)
 
     def _find_tag(self, _t, _u, label=""):
@@ -213,6 +527,10 @@ class ReposInfo(object):
         _repotgz = TGZFile(self._repofile)
         # prepare repo links
         _repos = {}
+        # all tags share the same listings
+        _hotfix_url = _n_url(base_url + 'hotfix')
+        _update_url = _n_url(base_url + 'update')
+        self._crawl([base_url, _hotfix_url, _update_url])
         if tag:
             # only one tag to process
             _repos.update(self._find_tag(tag, base_url))
@@ -226,8 +544,8 @@ class ReposInfo(object):
             if "update" in _tags:
                 _tags.remove('update')
             # search tags in subfolders
-            _h_tags, _ = self._ls_repo_page(base_url + 'hotfix')
-            _u_tags, _ = self._ls_repo_page(base_url + 'update')
+            _h_tags, _ = self._ls_repo_page(_hotfix_url)
+            _u_tags, _ = self._ls_repo_page(_update_url)
             _tags.extend([t for t in _h_tags if t not in _tags])
             _tags.extend([t for t in _u_tags if t not in _tags])
             _progress = Progress(len(_tags))
@@ -240,6 +558,8 @@ class ReposInfo(object):
                 _progress.write_progress(_index)
             _progress.end()
 
+        # list everything that will be needed at once
+        self._crawl_tags(_repos, _repotgz)
         # parse subtags
         for _label in _repos.keys():
             logger_cli.info("-> processing tag '{}'".format(_label))
@@ -282,8 +602,12 @@ class ReposInfo(object):
                     # if stag is the release, this is all packages
                     _repo["all"][_stag] = []
                     _repo["all"]["url"] = _n_url(_u)
-                    _path_list = self.search_pkg(_n_url(_u), [])
-                    self._map_repo(_path_list, _repo["all"][_stag])
+                    _path_list = self._search_packages(_n_url(_u))
+                    self._map_repo(
+                        _path_list,
+                        _repo["all"][_stag],
+                        hashes=self._hashes
+                    )
                     logger.info(
                         "-> found {} dists".format(
                             len(_repo["all"][_stag])
@@ -309,10 +633,13 @@ class ReposInfo(object):
                         else:
                             _rel_u = _n_url(_u) + _rel
                             _repo[_stag][_rel] = []
-                            _path_list = self.search_pkg(_n_url(_rel_u), [])
+                            _path_list = self._search_packages(
+                                _n_url(_rel_u)
+                            )
                             self._map_repo(
                                 _path_list,
-                                _repo[_stag][_rel]
+                                _repo[_stag][_rel],
+                                hashes=self._hashes
                             )
                             logger.info(
                                 "-> found {} dists for '{}'".format(
@@ -331,6 +658,11 @@ class ReposInfo(object):
                     _name
                 )
             )
+        # listings are not needed anymore
+        self._pages = {}
+        self._releases = {}
+        self._hashes = {}
+        self._http_cache.save()
 
         return
 
@@ -387,6 +719,14 @@ class RepoManager(object):
             _repos_versions_archive
         )
         self._desc_arch = os.path.join(self._arch_folder, _pkg_desc_archive)
+        self._store_file = os.path.join(
+            self._arch_folder,
+            _versions_store_filename
+        )
+        self._cache_file = os.path.join(
+            self._arch_folder,
+            _versions_cache_filename
+        )
 
     def _init_vars(self, info_class):
         # RepoInfo instance init
@@ -400,12 +740,31 @@ class RepoManager(object):
         # repository index
         self._repo_index = {}
         self._mainteiners_index = {}
+        # reverse lookups, not saved
+        self._repo_index_rev = {}
+        # repo header -> SHA256 of its last parsed Packages.gz
+        self._repo_hashes = {}
+        self._mainteiners_index_rev = {}
+        # header with no tag -> its keywords
+        self._header_tokens = {}
+        # keyword -> indices of repos having it in the header
+        self._token_repos = {}
 
         self._apps = {}
 
         # init package versions storage
         self._versions_mirantis = {}
         self._versions_other = {}
+        # packages updated while parsing, origin -> names
+        self._updated = {MIRANTIS: set(), OTHER: set()}
+        # optional indexed storage for versions
+        self._store = None
+        # package records read on demand in lazy mode
+        self._cache = None
+        # package -> [origin, tags it is in], loaded on first use
+        self._pkg_tags = None
+        # (package, tag) -> is_mirantis result
+        self._mirantis_cache = {}
 
     def _init_archives(self):
         # Init version files
@@ -418,34 +777,91 @@ class RepoManager(object):
             label="MCP Configuration Checker: Package descriptions archive"
         )
 
-        # section / app
-        self._apps = _safe_load(
-            self._apps_filename,
-            self.desctgz
-        )
-
-        # indices
-        self._repo_index = _safe_load(
-            _repos_index_filename,
-            self.versionstgz
-        )
-        self._mainteiners_index = _safe_load(
-            _mainteiners_index_filename,
-            self.versionstgz
-        )
+        # section / app, not used when showing packages
+        if not self.lazy:
+            self._apps = _safe_load(
+                self._apps_filename,
+                self.desctgz
+            )
 
-        # versions
-        self._versions_mirantis = _safe_load(
-            _mirantis_versions_filename,
-            self.versionstgz
-        )
-        self._versions_other = _safe_load(
-            _other_versions_filename,
+        self._repo_hashes = _safe_load(
+            _repos_hashes_filename,
             self.versionstgz
         )
+        if self.store_type == "sqlite":
+            self._store = VersionStore(self._store_file)
+            if self._store.empty:
+                # first run with the store, take versions from archive
+                self.import_versions_store()
+                self.store_imported = True
+            # versions are queried on demand, only indices are loaded
+            self._repo_index = self._store.get_repo_index()
+            self._mainteiners_index = self._store.get_mainteiners_index()
+        else:
+            # indices
+            self._repo_index = _safe_load(
+                _repos_index_filename,
+                self.versionstgz
+            )
+            self._mainteiners_index = _safe_load(
+                _mainteiners_index_filename,
+                self.versionstgz
+            )
+            # versions
+            if self.lazy:
+                self._cache = VersionsCache(
+                    self._cache_file,
+                    self._versions_arch,
+                    self._load_archive_versions
+                )
+            else:
+                self._set_versions(self._load_archive_versions())
+        self._repo_index_rev = _reverse_index(self._repo_index, header=True)
+        self._mainteiners_index_rev = _reverse_index(self._mainteiners_index)
+        for _index in self._repo_index:
+            self._index_header_tokens(_index)
+
+    def _index_header_tokens(self, index):
+        # headers are filtered with no tag in them
+        _cut_head = self._repo_index[index]["header"].split("_", 1)[1]
+        if _cut_head not in self._header_tokens:
+            self._header_tokens[_cut_head] = _split_header(_cut_head)
+        for _token in self._header_tokens[_cut_head]:
+            self._token_repos.setdefault(_token, set()).add(index)
+
+    def get_matching_repos(self, include, exclude):
+        """Indices of repos with all of include keywords
+        and none of exclude ones in the header
+        """
+        if include:
+            _repos = set.intersection(*[
+                self._token_repos.get(_kw, set()) for _kw in include
+            ])
+        else:
+            _repos = set(self._repo_index.keys())
+        for _kw in exclude:
+            _repos -= self._token_repos.get(_kw, set())
+        return _repos
 
-    def __init__(self, arch_folder=None, info_class=None):
+    def __init__(
+        self,
+        arch_folder=None,
+        info_class=None,
+        fetch_workers=1,
+        parse_workers=1,
+        store=None,
+        lazy=False
+    ):
         # Perform inits
+        self.fetch_workers = fetch_workers
+        self.parse_workers = parse_workers
+        # load package versions on first access, for show commands
+        self.lazy = lazy
+        # 'tgz' keeps versions in archive, 'sqlite' in indexed store
+        self.store_type = store if store else config.pkg_versions_store
+        # True when versions were imported to a new store at init
+        self.store_imported = False
+        self._apps_mode = False
         self._init_vars(info_class)
         self._init_folders(arch_folder)
         # Ensure that versions folder exists
@@ -460,8 +876,16 @@ class RepoManager(object):
         else:
             return self.__init__(self, *args, **kwargs)
 
-    def _create_repo_header(self, p):
-        _header = "_".join([
+    @property
+    def _http_cache(self):
+        # loaded on first download only, lazy 'show' never makes one
+        return get_http_cache(
+            os.path.join(self._arch_folder, _http_cache_filename)
+        )
+
+    @staticmethod
+    def _repo_header(p):
+        return "_".join([
             p['tag'],
             p['subset'],
             p['release'],
@@ -469,7 +893,20 @@ class RepoManager(object):
             p['type'],
             p['arch']
         ])
-        return _get_value_index(self._repo_index, p, header=_header)
+
+    def _create_repo_header(self, p):
+        _header = self._repo_header(p)
+        _count = len(self._repo_index)
+        _index = _get_value_index(
+            self._repo_index,
+            self._repo_index_rev,
+            p,
+            header=_header
+        )
+        if len(self._repo_index) > _count:
+            # new repo, keep its keywords too
+            self._index_header_tokens(_index)
+        return _index
 
     def _get_indexed_values(self, pair):
         _h, _m = pair.split('-')
@@ -564,6 +1001,220 @@ class RepoManager(object):
     #     else:
     #         return None
 
+    def _is_parsed(self, repo, descriptions):
+        # repo can be skipped only when it was parsed before
+        # and nothing else is collected from it
+        if descriptions or self._apps_mode:
+            return False
+        return self._repo_header(repo) in self._repo_index_rev
+
+    def _is_unchanged(self, repo, sha256):
+        return sha256 is not None and \
+            self._repo_hashes.get(self._repo_header(repo)) == sha256
+
+    def _get_repo_file(self, repo, parsed, stream=False):
+        # Request Packages.gz, '304 Not Modified' is possible only
+        # for the repos parsed before
+        return self._http_cache.get(
+            requests.get,
+            repo['filepath'],
+            conditional=parsed,
+            stream=stream
+        )[0]
+
+    def _fetch_repo_file(self, args):
+        # download gzipped Packages file as is,
+        # no content is returned if it is not changed
+        _repo, _descriptions = args
+        _parsed = self._is_parsed(_repo, _descriptions)
+        if _parsed and self._is_unchanged(_repo, _repo.get("sha256")):
+            return None, _descriptions
+        _r = self._get_repo_file(_repo, _parsed)
+        if _r.status_code == 304:
+            return None, _descriptions
+        _repo["sha256"] = hashlib.sha256(_r.content).hexdigest()
+        if _parsed and self._is_unchanged(_repo, _repo["sha256"]):
+            return None, _descriptions
+        return _r.content, _descriptions
+
+    @staticmethod
+    def _hash_chunks(chunks, repo):
+        # content hash is ready once the last chunk is consumed
+        _sha = hashlib.sha256()
+        for _chunk in chunks:
+            _sha.update(_chunk)
+            yield _chunk
+        repo["sha256"] = _sha.hexdigest()
+
+    def _get_packages_for_repos(self, repos, descriptions):
+        """Yields (repo, packages) pairs in the same order as repos given
+
+        With single workers, each Packages.gz is streamed and parsed
+        on the fly. Otherwise, a thread pool downloads files and
+        a process pool parses them into per-repo package lists.
+        """
+        if self.fetch_workers < 2 and self.parse_workers < 2:
+            for _pkg in repos:
+                _parsed = self._is_parsed(_pkg, descriptions)
+                if _parsed:
+                    # whole file is needed to check if it has changed
+                    _data, _ = self._fetch_repo_file((_pkg, descriptions))
+                    if _data is None:
+                        yield _pkg, None
+                        continue
+                    _chunks = [_data]
+                    _r = None
+                else:
+                    _r = self._get_repo_file(_pkg, _parsed, stream=True)
+                    _chunks = self._hash_chunks(
+                        _r.iter_content(chunk_size=65536),
+                        _pkg
+                    )
+                try:
+                    yield _pkg, _get_repo_packages(
+                        _get_stanzas(gunzip_lines(_chunks)),
+                        descriptions=descriptions
+                    )
+                finally:
+                    if _r is not None:
+                        _r.close()
+            return
+
+        logger_cli.info(
+            "-> using {} download and {} parsing workers".format(
+                self.fetch_workers,
+                self.parse_workers
+            )
+        )
+        # processes are forked before any download thread is started,
+        # forking a process with running threads is not safe
+        if self.parse_workers > 1:
+            _parse_pool = Pool(self.parse_workers)
+        else:
+            _parse_pool = None
+        _fetch_pool = ThreadPool(self.fetch_workers)
+
+        def _submit(_pkg):
+            # downloaded file goes to parsing as soon as it is ready,
+            # parse result (or error) is passed back via the queue
+            _result = Queue(maxsize=1)
+
+            def _fetched(_data):
+                try:
+                    if _parse_pool:
+                        _data = _parse_pool.apply_async(
+                            _parse_repo_file,
+                            (_data,)
+                        )
+                    _result.put(_data)
+                except Exception as e:
+                    _result.put(e)
+
+            _fetch_pool.apply_async(
+                self._fetch_repo_file,
+                ((_pkg, descriptions),),
+                callback=_fetched,
+                error_callback=_result.put
+            )
+            return _pkg, _result
+
+        def _collect(_pkg, _result):
+            _data = _result.get()
+            if isinstance(_data, Exception):
+                raise _data
+            if _parse_pool:
+                _records = _data.get()
+            else:
+                _records = _parse_repo_file(_data)
+            if _records is None:
+                return _pkg, None
+            else:
+                return _pkg, iter(_records)
+
+        # files are submitted from here, not from the pool threads,
+        # so an error or Ctrl-C leaves nothing blocked on terminate.
+        # Downloaded but not yet merged files kept in memory are limited
+        _in_flight = self.fetch_workers + self.parse_workers
+        _pending = deque()
+        try:
+            for _pkg in repos:
+                _pending.append(_submit(_pkg))
+                if len(_pending) >= _in_flight:
+                    yield _collect(*_pending.popleft())
+            while _pending:
+                yield _collect(*_pending.popleft())
+        finally:
+            _fetch_pool.terminate()
+            if _parse_pool:
+                _parse_pool.terminate()
+
+    def _merge_repo_packages(self, repo, records, descriptions, apps):
+        """Updates versions, apps and indices with packages of the repo
+
+        :return: number of packages processed and new packages added
+        """
+        _processed = 0
+        _new = 0
+        if descriptions:
+            _descriptions = {}
+        # repo header is the same for all packages in file
+        _h_index = self._create_repo_header(repo)
+        for _name, _version, _md5, _mainteiner, _section, _ap, _arch, \
+                _desc in records:
+            if apps:
+                # insert app
+                _sc = _section
+                try:
+                    _tmp = set(self._apps[_sc][_ap][_name])
+                    _tmp.add(_arch)
+                    self._apps[_sc][_ap][_name] = list(_tmp)
+                except KeyError:
+                    nested_set(
+                        self._apps,
+                        [_sc, _ap, _name],
+                        [_arch]
+                    )
+
+            # Check is mainteiner is Mirantis
+            if _mainteiner.endswith("@mirantis.com>"):
+                # update mirantis versions
+                _versions = self._versions_mirantis
+                self._updated[MIRANTIS].add(_name)
+            else:
+                # update other versions
+                _versions = self._versions_other
+                self._updated[OTHER].add(_name)
+            if self._update_pkg_version(
+                _versions,
+                _name,
+                _version,
+                _md5,
+                _section,
+                _ap,
+                _h_index,
+                _get_value_index(
+                    self._mainteiners_index,
+                    self._mainteiners_index_rev,
+                    _mainteiner
+                )
+            ):
+                _new += 1
+
+            if descriptions:
+                _d_new = {
+                    _md5: _desc
+                }
+                try:
+                    _descriptions[_name].update(_d_new)
+                except KeyError:
+                    _descriptions[_name] = _d_new
+            _processed += 1
+        # save descriptions if needed
+        if descriptions:
+            self._save_repo_descriptions(repo, _descriptions)
+
+        return _processed, _new
+
     def parse_tag(self, tag, descriptions=False, apps=False):
         """Download and parse Package.gz files for specific tag
         By default, descriptions not saved
@@ -592,11 +1243,8 @@ class RepoManager(object):
                 _other_repos
             )
         )
-        # init progress bar
-        _progress = Progress(_ubuntu_package_repos)
-        _index = 0
-        _processed = 0
-        _new = 0
+        # list of Packages.gz files to process, order matters
+        _repos = []
         for _c, _d in _info.items():
             # we do not need url here, just get rid of it
             if 'url' in _d:
@@ -605,151 +1253,97 @@ class RepoManager(object):
             for _ur, _l in _d.items():
                 # iterate package collections
                 for _p in _l:
-                    # descriptions
-                    if descriptions:
-                        _descriptions = {}
-                    # download and unzip
-                    _index += 1
-                    _progress.write_progress(
-                        _index,
-                        note="/ {} {} {} {} {}, GET 'Packages.gz'".format(
-                            _c,
-                            _ur,
-                            _p['ubuntu-release'],
-                            _p['type'],
-                            _p['arch']
-                        )
-                    )
-                    _raw = get_gzipped_file(_p['filepath'])
-                    if not _raw:
-                        # empty repo...
-                        _progress.clearline()
-                        logger_cli.warning(
-                            "# WARNING: Empty file: '{}'".format(
-                                _p['filepath']
-                            )
-                        )
-                        continue
-                    else:
-                        _raw = _raw.decode("utf-8")
-                    _progress.write_progress(
-                        _index,
-                        note="/ {} {} {} {} {}, {}/{}".format(
-                            _c,
-                            _ur,
-                            _p['ubuntu-release'],
-                            _p['type'],
-                            _p['arch'],
-                            _processed,
-                            _new
-                        )
-                    )
-                    _lines = _raw.splitlines()
-                    # break lines collection into isolated pkg data
                     _pkg = {
                         "tag": tag,
                         "subset": _c,
                         "release": _ur
                     }
                     _pkg.update(_p)
-                    _desc = {}
-                    _key = _value = ""
-                    # if there is no empty line at end, add it
-                    if _lines[-1] != '':
-                        _lines.append('')
-                    # Process lines
-                    for _line in _lines:
-                        if not _line:
-                            # if the line is empty, process pkg data gathered
-                            _name = _desc['package']
-                            _md5 = _desc['md5sum']
-                            _version = _desc['version']
-                            _mainteiner = _desc['maintainer']
-
-                            if 'source' in _desc:
-                                _ap = _desc['source'].lower()
-                            else:
-                                _ap = "-"
-
-                            if apps:
-                                # insert app
-                                _sc = _desc['section'].lower()
-                                if 'source' in _desc:
-                                    _ap = _desc['source'].lower()
-                                else:
-                                    _ap = "-"
-
-                                try:
-                                    _tmp = set(self._apps[_sc][_ap][_name])
-                                    _tmp.add(_desc['architecture'])
-                                    self._apps[_sc][_ap][_name] = list(_tmp)
-                                except KeyError:
-                                    nested_set(
-                                        self._apps,
-                                        [_sc, _ap, _name],
-                                        [_desc['architecture']]
-                                    )
-
-                            # Check is mainteiner is Mirantis
-                            if _mainteiner.endswith("@mirantis.com>"):
-                                # update mirantis versions
-                                if self._update_pkg_version(
-                                    self._versions_mirantis,
-                                    _name,
-                                    _version,
-                                    _md5,
-                                    _desc['section'].lower(),
-                                    _ap,
-                                    self._create_repo_header(_pkg),
-                                    _get_value_index(
-                                        self._mainteiners_index,
-                                        _mainteiner
-                                    )
-                                ):
-                                    _new += 1
-                            else:
-                                # update other versions
-                                if self._update_pkg_version(
-                                    self._versions_other,
-                                    _name,
-                                    _version,
-                                    _md5,
-                                    _desc['section'].lower(),
-                                    _ap,
-                                    self._create_repo_header(_pkg),
-                                    _get_value_index(
-                                        self._mainteiners_index,
-                                        _mainteiner
-                                    )
-                                ):
-                                    _new += 1
-
-                            if descriptions:
-                                _d_new = {
-                                    _md5: deepcopy(_desc)
-                                }
-                                try:
-                                    _descriptions[_name].update(_d_new)
-                                except KeyError:
-                                    _descriptions[_name] = _d_new
-                            # clear the data for next pkg
-                            _processed += 1
-                            _desc = {}
-                            _key = ""
-                            _value = ""
-                        elif _line.startswith(' '):
-                            _desc[_key] += "\n{}".format(_line)
-                        else:
-                            _key, _value = _line.split(': ', 1)
-                            _key = _key.lower()
-
-                            _desc[_key] = _value
-                    # save descriptions if needed
-                    if descriptions:
-                        _progress.clearline()
-                        self._save_repo_descriptions(_pkg, _descriptions)
+                    _repos.append(_pkg)
+        # init progress bar
+        _progress = Progress(_ubuntu_package_repos)
+        _index = 0
+        _processed = 0
+        _new = 0
+        _parse_time = 0
+        _not_modified = 0
+        # apps are collected only while parsing
+        self._apps_mode = apps
+        _start = time.time()
+        for _pkg, _records in self._get_packages_for_repos(
+            _repos,
+            descriptions
+        ):
+            _index += 1
+            _progress.write_progress(
+                _index,
+                note="/ {} {} {} {} {}, {}/{}".format(
+                    _pkg['subset'],
+                    _pkg['release'],
+                    _pkg['ubuntu-release'],
+                    _pkg['type'],
+                    _pkg['arch'],
+                    _processed,
+                    _new
+                )
+            )
+            if _records is None:
+                # Packages.gz not changed, versions are already there
+                _not_modified += 1
+                logger.debug(
+                    "... not modified, skipped: '{}'".format(
+                        _pkg['filepath']
+                    )
+                )
+                _start = time.time()
+                continue
+            _first = next(_records, None)
+            if not _first:
+                # empty repo...
+                _progress.clearline()
+                logger_cli.warning(
+                    "# WARNING: Empty file: '{}'".format(_pkg['filepath'])
+                )
+                _start = time.time()
+                continue
+            _stanzas, _new_pkgs = self._merge_repo_packages(
+                _pkg,
+                chain([_first], _records),
+                descriptions=descriptions,
+                apps=apps
+            )
+            _processed += _stanzas
+            _new += _new_pkgs
+            # repo is parsed, save the hash of its content
+            if _pkg.get("sha256"):
+                self._repo_hashes[self._repo_header(_pkg)] = _pkg["sha256"]
+            # parser throughput for this repo
+            _elapsed = time.time() - _start
+            _parse_time += _elapsed
+            logger.debug(
+                "... parsed {} packages in {:.2f}s, {:.0f}/s: '{}'".format(
+                    _stanzas,
+                    _elapsed,
+                    _stanzas / _elapsed if _elapsed else 0,
+                    _pkg['filepath']
+                )
+            )
+            _start = time.time()
 
         _progress.end()
+        logger_cli.debug(
+            "... parsed {} packages in {:.2f}s, {:.0f}/s".format(
+                _processed,
+                _parse_time,
+                _processed / _parse_time if _parse_time else 0
+            )
+        )
+        if _not_modified:
+            logger_cli.info(
+                "-> {} repos not changed since last parsing".format(
+                    _not_modified
+                )
+            )
         # backup headers to disk
         self.versionstgz.add_file(
             _repos_index_filename,
@@ -761,6 +1355,11 @@ class RepoManager(object):
             json.dumps(self._mainteiners_index),
             replace=True
         )
+        self.versionstgz.add_file(
+            _repos_hashes_filename,
+            json.dumps(self._repo_hashes),
+            replace=True
+        )
         if apps:
             self.desctgz.add_file(
                 self._apps_filename,
@@ -780,19 +1379,160 @@ class RepoManager(object):
             )
         # if there is no such tag, parse it from repoinfo
         logger_cli.info("# Fetching versions for {}".format(tag))
+        if self._store:
+            # merging needs all of the versions
+            self._versions_mirantis = self._store.get_versions(MIRANTIS)
+            self._versions_other = self._store.get_versions(OTHER)
+        elif self._cache:
+            self._cache.close()
+            self._cache = None
+            self._set_versions(self._load_archive_versions())
         self.parse_tag(tag, descriptions=descriptions, apps=apps)
         logger_cli.info("-> saving updated versions")
-        self.versionstgz.add_file(
-            _mirantis_versions_filename,
-            json.dumps(self._versions_mirantis),
-            replace=True
+        if self._store:
+            # only updated packages are written
+            self._store.save(
+                self._repo_index,
+                self._mainteiners_index,
+                {
+                    MIRANTIS: self._get_updated(MIRANTIS),
+                    OTHER: self._get_updated(OTHER)
+                }
+            )
+            self._versions_mirantis = {}
+            self._versions_other = {}
+        else:
+            self.versionstgz.add_file(
+                _mirantis_versions_filename,
+                json.dumps(self._versions_mirantis),
+                replace=True
+            )
+            self.versionstgz.add_file(
+                _other_versions_filename,
+                json.dumps(self._versions_other),
+                replace=True
+            )
+        self._update_pkg_tags(self._updated[MIRANTIS] | self._updated[OTHER])
+        self._updated = {MIRANTIS: set(), OTHER: set()}
+        # versions saved, validators are safe to use from now on
+        self._http_cache.save()
+
+    def _get_updated(self, origin):
+        _versions = self._get_versions_map(origin)
+        return {_n: _versions[_n] for _n in self._updated[origin]}
+
+    def _get_versions_map(self, origin):
+        if origin == MIRANTIS:
+            return self._versions_mirantis
+        else:
+            return self._versions_other
+
+    def _set_versions(self, versions):
+        self._versions_mirantis = versions[MIRANTIS]
+        self._versions_other = versions[OTHER]
+
+    def _load_archive_versions(self):
+        return {
+            MIRANTIS: _safe_load(
+                _mirantis_versions_filename,
+                self.versionstgz
+            ),
+            OTHER: _safe_load(
+                _other_versions_filename,
+                self.versionstgz
+            )
+        }
+
+    def import_versions_store(self):
+        """Imports versions from the archive into the store
+        """
+        logger_cli.info(
+            "-> importing versions from '{}' to '{}'".format(
+                self._versions_arch,
+                self._store_file
+            )
         )
-        self.versionstgz.add_file(
-            _other_versions_filename,
-            json.dumps(self._versions_other),
-            replace=True
+        self._store.import_maps(
+            _safe_load(_repos_index_filename, self.versionstgz),
+            _safe_load(_mainteiners_index_filename, self.versionstgz),
+            _safe_load(_mirantis_versions_filename, self.versionstgz),
+            _safe_load(_other_versions_filename, self.versionstgz)
         )
 
+    def export_versions_store(self):
+        """Exports versions from the store into the archive
+        """
+        logger_cli.info(
+            "-> exporting versions from '{}' to '{}'".format(
+                self._store_file,
+                self._versions_arch
+            )
+        )
+        _files = zip(
+            [
+                _repos_index_filename,
+                _mainteiners_index_filename,
+                _mirantis_versions_filename,
+                _other_versions_filename
+            ],
+            self._store.export_maps()
+        )
+        for _filename, _data in _files:
+            self.versionstgz.add_file(
+                _filename,
+                json.dumps(_data),
+                replace=True
+            )
+        # maintainer classes are rebuilt from exported versions
+        self._pkg_tags = {}
+        self._update_pkg_tags(
+            self._get_pkg_names(MIRANTIS) | self._get_pkg_names(OTHER)
+        )
+
+    def _get_package_records(self, name):
+        # origin -> version records of the package
+        if self._store:
+            return self._store.get_package(name)
+        _records = {}
+        if self._cache:
+            for _origin in [MIRANTIS, OTHER]:
+                _vs = self._cache.get(_origin, name)
+                if _vs is not None:
+                    _records[_origin] = _vs
+            return _records
+        if name in self._versions_mirantis:
+            _records[MIRANTIS] = self._versions_mirantis[name]
+        if name in self._versions_other:
+            _records[OTHER] = self._versions_other[name]
+        return _records
+
+    def _has_package(self, origin, name):
+        if self._store:
+            return self._store.has_package(origin, name)
+        if self._cache:
+            return self._cache.has_package(origin, name)
+        return name in self._get_versions_map(origin)
+
+    def _get_pkg_names(self, origin):
+        if self._store:
+            return self._store.get_names(origin)
+        if self._cache:
+            return self._cache.get_names(origin)
+        return set(self._get_versions_map(origin).keys())
+
+    def _get_app_versions(self, origin, name):
+        if self._store:
+            return self._store.get_versions(
+                origin,
+                app=None if name == '*' else name
+            )
+        if self._cache:
+            return self._cache.get_versions(
+                origin,
+                app=None if name == '*' else name
+            )
+        return self._get_versions_map(origin)
+
     def build_repos(self, url, tag=None):
         """Builds versions data for selected tag, or for all of them
         """
@@ -962,12 +1702,12 @@ class RepoManager(object):
 
     def show_app(self, name):
         c = 0
-        rows = self.get_apps(self._versions_mirantis, name)
+        rows = self.get_apps(self._get_app_versions(MIRANTIS, name), name)
         if rows:
             logger_cli.info("\n# Mirantis packages for '{}'".format(name))
             logger_cli.info("\n".join(rows))
             c += 1
-        rows = self.get_apps(self._versions_other, name)
+        rows = self.get_apps(self._get_app_versions(OTHER, name), name)
         if rows:
             logger_cli.info("\n# Other packages for '{}'".format(name))
             logger_cli.info("\n".join(rows))
@@ -977,69 +1717,92 @@ class RepoManager(object):
 
     def get_mirantis_pkg_names(self):
         # Mirantis maintainers only
-        return set(
-            self._versions_mirantis.keys()
-        ) - set(
-            self._versions_other.keys()
-        )
+        return self._get_pkg_names(MIRANTIS) - self._get_pkg_names(OTHER)
 
     def get_other_pkg_names(self):
         # Non-mirantis Maintainers
-        return set(
-            self._versions_other.keys()
-        ) - set(
-            self._versions_mirantis.keys()
-        )
+        return self._get_pkg_names(OTHER) - self._get_pkg_names(MIRANTIS)
 
     def get_mixed_pkg_names(self):
         # Mixed maintainers
-        return set(
-            self._versions_mirantis.keys()
-        ).intersection(set(
-            self._versions_other.keys()
-        ))
+        return self._get_pkg_names(MIRANTIS).intersection(
+            self._get_pkg_names(OTHER)
+        )
+
+    def _get_pkg_class(self, name):
+        # origin checked first and tags of all package versions
+        _records = self._get_package_records(name)
+        if MIRANTIS in _records:
+            _origin = MIRANTIS
+        elif OTHER in _records:
+            _origin = OTHER
+        else:
+            return None
+        _vs = {}
+        for _o in [MIRANTIS, OTHER]:
+            if _o in _records:
+                _vs.update(_records[_o])
+        _tags = set()
+        for _d1 in _vs.values():
+            for _info in _d1.values():
+                for _pair in _info['repo']:
+                    _r, _ = self._get_indexed_values(_pair)
+                    _tags.add(_r["props"]["tag"])
+        return [_origin, sorted(_tags)]
+
+    def _build_pkg_tags(self, names):
+        # maintainer class and tags for each of the packages
+        _pkg_tags = {}
+        for _name in names:
+            _class = self._get_pkg_class(_name)
+            if _class:
+                _pkg_tags[_name] = _class
+        return _pkg_tags
+
+    def _get_pkg_tags(self):
+        if self._pkg_tags is None:
+            self._pkg_tags = _safe_load(_pkg_tags_filename, self.versionstgz)
+            _names = self._get_pkg_names(MIRANTIS) | \
+                self._get_pkg_names(OTHER)
+            if not self._pkg_tags and _names:
+                # archive made before the index was there,
+                # reading it should not change it, so the index
+                # is kept in memory and saved by the next fetch
+                logger_cli.info("-> building package maintainers index")
+                self._pkg_tags = self._build_pkg_tags(_names)
+        return self._pkg_tags
+
+    def _update_pkg_tags(self, names):
+        """Updates maintainer class and tags of the packages
+        and saves the index to the versions archive
+        """
+        _pkg_tags = self._get_pkg_tags()
+        _classes = self._build_pkg_tags(names)
+        for _name in names:
+            if _name in _classes:
+                _pkg_tags[_name] = _classes[_name]
+            else:
+                _pkg_tags.pop(_name, None)
+        self._mirantis_cache = {}
+        # index built in memory for an old archive is saved as well
+        if names or not self.versionstgz.has_file(_pkg_tags_filename):
+            self.versionstgz.add_file(
+                _pkg_tags_filename,
+                json.dumps(_pkg_tags),
+                replace=True
+            )
 
     def is_mirantis(self, name, tag=None):
         """Method checks if this package is mainteined
         by mirantis in target tag repo
         """
-        if name in self._versions_mirantis:
-            # check tag
-            if tag:
-                _pkg = self.get_package_versions(
-                    name,
-                    tagged=True
-                )
-                _tags = []
-                for s in _pkg.keys():
-                    for a in _pkg[s].keys():
-                        for t in _pkg[s][a].keys():
-                            _tags.append(t)
-                if any([t.startswith(tag) for t in _tags]):
-                    return True
-                else:
-                    return None
-            else:
-                return True
-        elif name in self._versions_other:
-            # check tag
-            if tag:
-                _pkg = self.get_package_versions(
-                    name,
-                    tagged=True
-                )
-                _tags = []
-                for s in _pkg.keys():
-                    for a in _pkg[s].keys():
-                        for t in _pkg[s][a].keys():
-                            _tags.append(t)
-                if any([t.startswith(tag) for t in _tags]):
-                    return False
-                else:
-                    return None
-            else:
-                return False
-        else:
+        try:
+            return self._mirantis_cache[(name, tag)]
+        except KeyError:
+            pass
+        try:
+            _origin, _tags = self._get_pkg_tags()[name]
+        except KeyError:
             logger.error(
                 "# ERROR: package '{}' not found "
                 "while determining maintainer".format(
@@ -1047,6 +1810,12 @@ class RepoManager(object):
                 )
             )
             return None
+        _is = _origin == MIRANTIS
+        # check tag
+        if tag and not any(_t.startswith(tag) for _t in _tags):
+            _is = None
+        self._mirantis_cache[(name, tag)] = _is
+        return _is
 
     def get_filtered_versions(
         self,
@@ -1060,6 +1829,8 @@ class RepoManager(object):
         """
         if tag:
             tag = str(tag) if not isinstance(tag, str) else tag
+        _include = frozenset(include)
+        _exclude = frozenset(exclude)
         _out = {}
         _vs = self.get_package_versions(name, tagged=True)
         # iterate to filter out keywords
@@ -1075,10 +1846,13 @@ class RepoManager(object):
                     for v, rp in vs.items():
                         for h, p in rp.items():
                             # filter headers with all keywords matching
-                            _h = re.split(r"[\-\_]+", h)
-                            _included = all([kw in _h for kw in include])
-                            _excluded = any([kw in _h for kw in exclude])
-                            if not _included or _excluded:
+                            try:
+                                _h = self._header_tokens[h]
+                            except KeyError:
+                                _h = _split_header(h)
+                                self._header_tokens[h] = _h
+                            if not _include <= _h or \
+                                    not _exclude.isdisjoint(_h):
                                 continue
                             else:
                                 nested_set(_out, [s, a, v], [])
@@ -1089,17 +1863,172 @@ class RepoManager(object):
                                 _out[s][a][v].append(_dat)
         return _out
 
+    def _get_tag_repos(self, tag):
+        # repos of the tag and its updates, hotfix is skipped
+        # same as in get_filtered_versions
+        _repos = set()
+        for _index, _r in self._repo_index.items():
+            _t = _r["props"]["tag"]
+            if tag and _t != tag and _t.rsplit('.', 1)[0] != tag:
+                continue
+            if _t == tag + ".hotfix":
+                continue
+            _repos.add(_index)
+        return _repos
+
+    def get_release_versions(self, packages, tags, os_release, exclude):
+        """Release versions for many packages in a single pass
+
+        For each package, repos are searched in every tag in order,
+        first with Openstack release keyword and then in repos
+        with no 'openstack' keyword. First search with results wins,
+        as with get_filtered_versions calls one after another.
+
+        :packages: - package name -> (codename, arch) of its node
+        :tags: - tags to search in, in order of preference
+        :os_release: - Openstack release keyword, i.e. 'pike'
+        :exclude: - keywords of repos to skip
+        :return: - name -> newest DebianVersion, its repos,
+                   sections and apps
+        """
+        _tag_repos = [self._get_tag_repos(str(_t)) for _t in tags]
+        _repo_tags = {
+            _index: _r["props"]["tag"]
+            for _index, _r in self._repo_index.items()
+        }
+        # (codename, arch) -> repo indices for each search
+        _searches = {}
+        _out = {}
+        for _name, _node in packages.items():
+            if _node not in _searches:
+                _codename, _arch = _node
+                _searches[_node] = []
+                for _repos in _tag_repos:
+                    _searches[_node].append(_repos & self.get_matching_repos(
+                        [os_release, _codename, _arch],
+                        exclude
+                    ))
+                    _searches[_node].append(_repos & self.get_matching_repos(
+                        [_codename, _arch],
+                        exclude + ['openstack']
+                    ))
+            _out[_name] = self._get_release_version(
+                self._find_release_repos(_name, _searches[_node], _repo_tags)
+            )
+        return _out
+
+    def _find_release_repos(self, name, searches, repo_tags):
+        # single pass over package records for all of the searches
+        _vs = {}
+        _records = self._get_package_records(name)
+        for _origin in [MIRANTIS, OTHER]:
+            if _origin in _records:
+                _vs.update(_records[_origin])
+        # order in which sections, apps and tags are seen first,
+        # so the result is the same as from the package tree
+        _order = {}
+        _hits = [{} for _ in searches]
+        for _v_order, (_v, _d1) in enumerate(_vs.items()):
+            for _md5, _info in _d1.items():
+                _s = _info['section']
+                _a = _info['app']
+                for _pair in _info['repo']:
+                    _h, _m = _pair.split('-')
+                    _t = repo_tags[_h]
+                    if (_s, _a, _t) not in _order:
+                        for _k in [(_s,), (_s, _a), (_s, _a, _t)]:
+                            _order.setdefault(_k, len(_order))
+                    for _idx, _repos in enumerate(searches):
+                        if _h in _repos:
+                            _cut_head = self._repo_index[_h]["header"].split(
+                                "_",
+                                1
+                            )[1]
+                            # last one wins, as with the tree
+                            _hits[_idx][(_s, _a, _t, _v, _cut_head)] = \
+                                (_v_order, _h, _m, _md5)
+        _out = {}
+        for _found in _hits:
+            if not _found:
+                continue
+            _keys = sorted(
+                _found,
+                key=lambda k: (
+                    _order[k[:1]],
+                    _order[k[:2]],
+                    _order[k[:3]],
+                    _found[k][0]
+                )
+            )
+            for _key in _keys:
+                _s, _a, _t, _v, _cut_head = _key
+                _, _h, _m, _md5 = _found[_key]
+                _dat = {
+                    "header": _cut_head,
+                    "maintainer": self._mainteiners_index[_m],
+                    "md5": _md5
+                }
+                _dat.update(self._repo_index[_h]["props"])
+                nested_set(_out, [_s, _a, _v], [])
+                _out[_s][_a][_v].append(_dat)
+            break
+        return _out
+
+    @staticmethod
+    def _get_release_version(filtered):
+        # newest version among filtered, with its repos
+        _vs = {}
+        _sections = {}
+        _apps = {}
+        for s, apps in filtered.items():
+            for a, versions in apps.items():
+                for v, repos in versions.items():
+                    for repo in repos:
+                        if v not in _vs:
+                            _vs[v] = []
+                        _vs[v].append(repo)
+                        if v not in _sections:
+                            _sections[v] = []
+                        _sections[v].append(s)
+                        if v not in _apps:
+                            _apps[v] = []
+                        _apps[v].append(a)
+        _vs_keys = iter(_vs.keys())
+        # get next version, if any
+        try:
+            _newest = DebianVersion(next(_vs_keys))
+        except StopIteration:
+            _newest = DebianVersion('')
+        # iterate others, if any
+        for v in _vs_keys:
+            _this = DebianVersion(v)
+            if _this > _newest:
+                _newest = _this
+        if _newest.version != 'n/a':
+            return {
+                "r": _newest,
+                "repos": _vs[_newest.version],
+                "sections": _sections[_newest.version],
+                "apps": _apps[_newest.version]
+            }
+        else:
+            return {
+                "r": _newest,
+                "repos": [],
+                "sections": [],
+                "apps": []
+            }
+
     def get_package_versions(self, name, tagged=False):
         """Method builds package version structure
         with repository properties included
         """
         # get data
         _vs = {}
-
-        if name in self._versions_mirantis:
-            _vs.update(self._versions_mirantis[name])
-        if name in self._versions_other:
-            _vs.update(self._versions_other[name])
+        _records = self._get_package_records(name)
+        for _origin in [MIRANTIS, OTHER]:
+            if _origin in _records:
+                _vs.update(_records[_origin])
 
         # insert repo data, insert props into headers place
         _package = {}
@@ -0,0 +1,361 @@
+import json
+import os
+import sqlite3
+import tempfile
+from threading import Lock
+
+from cfg_checker.common import logger_cli
+
+# package origins, same split as for versions archive files
+MIRANTIS = "mirantis"
+OTHER = "other"
+
+_schema = """
+CREATE TABLE IF NOT EXISTS repos (
+    id TEXT PRIMARY KEY,
+    header TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    props TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS maintainers (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS packages (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    origin TEXT NOT NULL,
+    UNIQUE (name, origin)
+);
+CREATE TABLE IF NOT EXISTS versions (
+    id INTEGER PRIMARY KEY,
+    package_id INTEGER NOT NULL REFERENCES packages(id) ON DELETE CASCADE,
+    version TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS md5s (
+    id INTEGER PRIMARY KEY,
+    version_id INTEGER NOT NULL REFERENCES versions(id) ON DELETE CASCADE,
+    md5 TEXT NOT NULL,
+    section TEXT NOT NULL,
+    app TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS md5_repos (
+    id INTEGER PRIMARY KEY,
+    md5_id INTEGER NOT NULL REFERENCES md5s(id) ON DELETE CASCADE,
+    repo_id TEXT NOT NULL,
+    maintainer_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS versions_package ON versions(package_id);
+CREATE INDEX IF NOT EXISTS md5s_version ON md5s(version_id);
+CREATE INDEX IF NOT EXISTS md5s_app ON md5s(app);
+CREATE INDEX IF NOT EXISTS md5_repos_md5 ON md5_repos(md5_id);
+CREATE INDEX IF NOT EXISTS repos_tag ON repos(tag);
+"""
+
+# version records of packages in the same layout as in archive
+_versions_query = """
+SELECT p.name, v.version, m.md5, m.section, m.app,
+    r.repo_id || '-' || r.maintainer_id
+FROM packages p
+JOIN versions v ON v.package_id = p.id
+JOIN md5s m ON m.version_id = v.id
+JOIN md5_repos r ON r.md5_id = m.id
+WHERE {}
+ORDER BY p.id, v.id, m.id, r.id
+"""
+
+
+def _collect_versions(rows):
+    # rows -> {name: {version: {md5: {'repo': [...], ...}}}}
+    _out = {}
+    for _name, _v, _md5, _section, _app, _pair in rows:
+        _vs = _out.setdefault(_name, {}).setdefault(_v, {})
+        if _md5 not in _vs:
+            _vs[_md5] = {
+                'repo': [],
+                'section': _section,
+                'app': _app
+            }
+        _vs[_md5]['repo'].append(_pair)
+    return _out
+
+
+class VersionStore(object):
+    """SQLite storage for package versions and repo indices.
+
+    Same data as the versions archive JSON files, but single
+    package queries do not need the whole maps to be loaded.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self._lock = Lock()
+        self._db = sqlite3.connect(filename, check_same_thread=False)
+        self._db.execute("PRAGMA foreign_keys = ON")
+        self._db.executescript(_schema)
+        logger_cli.debug(
+            "... opened versions store '{}'".format(self.filename)
+        )
+
+    @property
+    def empty(self):
+        # True when nothing was saved to the store yet,
+        # store could be created by a run that failed before saving
+        return not self._query("SELECT 1 FROM repos LIMIT 1") and \
+            not self._query("SELECT 1 FROM packages LIMIT 1")
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _query(self, sql, args=()):
+        with self._lock:
+            return self._db.execute(sql, args).fetchall()
+
+    # indices
+    def get_repo_index(self):
+        return {
+            _id: {"header": _h, "props": json.loads(_p)}
+            for _id, _h, _p in self._query(
+                "SELECT id, header, props FROM repos ORDER BY rowid"
+            )
+        }
+
+    def get_mainteiners_index(self):
+        return dict(
+            self._query("SELECT id, name FROM maintainers ORDER BY rowid")
+        )
+
+    def _save_indices(self, repo_index, mainteiners_index):
+        self._db.executemany(
+            "INSERT OR REPLACE INTO repos (id, header, tag, props) "
+            "VALUES (?, ?, ?, ?)",
+            [
+                (_id, _r["header"], _r["props"]["tag"],
+                 json.dumps(_r["props"]))
+                for _id, _r in repo_index.items()
+            ]
+        )
+        self._db.executemany(
+            "INSERT OR REPLACE INTO maintainers (id, name) VALUES (?, ?)",
+            list(mainteiners_index.items())
+        )
+
+    # versions
+    def get_versions(self, origin, names=None, app=None):
+        """Version records for packages of the origin
+
+        :names: - only these packages, all of them if not set
+        :app: - only records of the app
+        :return: - dict in the same format as versions archive files
+        """
+        _where = ["p.origin = ?"]
+        _args = [origin]
+        if names is not None:
+            names = list(names)
+            _where.append(
+                "p.name IN ({})".format(", ".join("?" * len(names)))
+            )
+            _args += names
+        if app is not None:
+            _where.append("m.app = ?")
+            _args.append(app)
+        return _collect_versions(self._query(
+            _versions_query.format(" AND ".join(_where)),
+            _args
+        ))
+
+    def get_package(self, name):
+        # origin -> version records of a single package
+        _out = {}
+        for _origin in [MIRANTIS, OTHER]:
+            _vs = self.get_versions(_origin, names=[name])
+            if name in _vs:
+                _out[_origin] = _vs[name]
+        return _out
+
+    def has_package(self, origin, name):
+        return bool(self._query(
+            "SELECT 1 FROM packages WHERE name = ? AND origin = ?",
+            (name, origin)
+        ))
+
+    def get_names(self, origin):
+        return set(
+            _r[0] for _r in self._query(
+                "SELECT name FROM packages WHERE origin = ?",
+                (origin,)
+            )
+        )
+
+    def _save_packages(self, origin, versions):
+        # replace all records of given packages
+        _c = self._db.cursor()
+        _c.executemany(
+            "DELETE FROM packages WHERE name = ? AND origin = ?",
+            [(_name, origin) for _name in versions]
+        )
+        for _name, _vs in versions.items():
+            _c.execute(
+                "INSERT INTO packages (name, origin) VALUES (?, ?)",
+                (_name, origin)
+            )
+            _p_id = _c.lastrowid
+            for _v, _md5s in _vs.items():
+                _c.execute(
+                    "INSERT INTO versions (package_id, version) "
+                    "VALUES (?, ?)",
+                    (_p_id, _v)
+                )
+                _v_id = _c.lastrowid
+                for _md5, _info in _md5s.items():
+                    _c.execute(
+                        "INSERT INTO md5s (version_id, md5, section, app) "
+                        "VALUES (?, ?, ?, ?)",
+                        (_v_id, _md5, _info['section'], _info['app'])
+                    )
+                    _m_id = _c.lastrowid
+                    _c.executemany(
+                        "INSERT INTO md5_repos "
+                        "(md5_id, repo_id, maintainer_id) VALUES (?, ?, ?)",
+                        [
+                            [_m_id] + _pair.split('-')
+                            for _pair in _info['repo']
+                        ]
+                    )
+
+    def save(self, repo_index, mainteiners_index, versions):
+        """Saves indices and package records in one transaction
+
+        :versions: - origin -> {name: version records}, only packages
+                     given are replaced, others are kept as is
+        """
+        with self._lock, self._db:
+            self._save_indices(repo_index, mainteiners_index)
+            for _origin, _vs in versions.items():
+                self._save_packages(_origin, _vs)
+
+    def import_maps(self, repo_index, mainteiners_index, mirantis, other):
+        # full import, everything that was there before is dropped
+        with self._lock, self._db:
+            for _table in ["packages", "repos", "maintainers"]:
+                self._db.execute("DELETE FROM {}".format(_table))
+            self._save_indices(repo_index, mainteiners_index)
+            self._save_packages(MIRANTIS, mirantis)
+            self._save_packages(OTHER, other)
+
+    def export_maps(self):
+        return (
+            self.get_repo_index(),
+            self.get_mainteiners_index(),
+            self.get_versions(MIRANTIS),
+            self.get_versions(OTHER)
+        )
+
+
+class VersionsCache(object):
+    """Uncompressed copy of the versions archive maps with offset index.
+
+    Single package records are read from the cache file with one seek,
+    so whole maps are not loaded for single package queries.
+    Cache is rebuilt when the archive it was made from changes.
+    """
+    _index_ext = ".idx"
+
+    def __init__(self, filename, source, loader):
+        """
+        :filename: - cache file, index is kept next to it
+        :source: - archive file the cache is made from
+        :loader: - function returning origin -> versions map,
+                   called only when cache is missing or outdated
+        """
+        self.filename = filename
+        self._index_file = filename + self._index_ext
+        _st = os.stat(source)
+        self._stamp = [_st.st_mtime_ns, _st.st_size]
+        self._index = None
+        if os.path.exists(self._index_file):
+            with open(self._index_file) as f:
+                self._index = json.load(f)
+        if not self._index or self._index["stamp"] != self._stamp:
+            self._build(loader())
+        self._file = open(self.filename, "rb")
+
+    @staticmethod
+    def _write_file(filename, write, mode="w"):
+        # unique temp file next to the target, so concurrent runs
+        # do not write to the same one and replace stays atomic
+        _fd, _tmp = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(filename)),
+            prefix=os.path.basename(filename) + ".",
+            suffix=".tmp"
+        )
+        try:
+            with os.fdopen(_fd, mode) as f:
+                write(f)
+            os.replace(_tmp, filename)
+        except BaseException:
+            os.remove(_tmp)
+            raise
+
+    def _build(self, versions):
+        logger_cli.info(
+            "-> building versions cache '{}'".format(self.filename)
+        )
+        _offsets = {}
+        _apps = {}
+
+        def _write_data(f):
+            for _origin, _vs in versions.items():
+                _offsets[_origin] = {}
+                _apps[_origin] = {}
+                for _name, _records in _vs.items():
+                    _buf = json.dumps(_records).encode('utf-8')
+                    _offsets[_origin][_name] = [f.tell(), len(_buf)]
+                    f.write(_buf)
+                    for _md5s in _records.values():
+                        for _info in _md5s.values():
+                            _names = _apps[_origin].setdefault(
+                                _info['app'],
+                                []
+                            )
+                            if not _names or _names[-1] != _name:
+                                _names.append(_name)
+
+        self._write_file(self.filename, _write_data, mode="wb")
+        self._index = {
+            "stamp": self._stamp,
+            "offsets": _offsets,
+            "apps": _apps
+        }
+        self._write_file(
+            self._index_file,
+            lambda f: json.dump(self._index, f)
+        )
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def get(self, origin, name):
+        try:
+            _offset, _size = self._index["offsets"][origin][name]
+        except KeyError:
+            return None
+        self._file.seek(_offset)
+        return json.loads(self._file.read(_size).decode('utf-8'))
+
+    def has_package(self, origin, name):
+        return name in self._index["offsets"].get(origin, {})
+
+    def get_names(self, origin):
+        return set(self._index["offsets"].get(origin, {}).keys())
+
+    def get_versions(self, origin, app=None):
+        # versions map for all packages or for packages of the app
+        if app is None:
+            _names = self._index["offsets"].get(origin, {}).keys()
+        else:
+            _names = self._index["apps"].get(origin, {}).get(app, [])
+        return {_name: self.get(origin, _name) for _name in _names}
@@ -1,10 +1,14 @@
 import csv
 import os
 import re
+from functools import lru_cache
 
 from cfg_checker.common import config, const, logger_cli
 from cfg_checker.common.settings import pkg_dir
 
+# parsed versions kept in memory, oldest are dropped
+_version_cache_size = 65536
+
 
 class PkgVersions(object):
     _labels = []
@@ -80,18 +84,53 @@ class PkgVersions(object):
             return None
 
 
-class DebianVersion(object):
-    epoch = None
-    epoch_status = const.VERSION_NA
-    upstream = None
-    upstream_rev = None
-    upstream_status = const.VERSION_NA
-    debian = None
-    debian_rev = None
-    debian_status = const.VERSION_NA
+def _split_num(fragment):
+    # numeric fragments are compared as lists of ints,
+    # dot separated or, if there is no dots, per digit
+    _l = fragment.split('.') if '.' in fragment else list(fragment)
+    # cast them to ints, delete empty strs
+    return tuple(int(n) for n in _l if len(n))
+
+
+def _split_lex(fragment):
+    # split string into letters and numbers
+    # and cast each item into its ORD value
+    _out = []
+    for _item in re.split(r'(\d+)', fragment):
+        try:
+            # try to convert it to number
+            _out.append(int(_item))
+        except ValueError:
+            # not a number
+            _out += [ord(n) for n in _item]
+    return tuple(_out)
 
-    status = ""
-    version = ""
+
+@lru_cache(maxsize=_version_cache_size)
+def _intern_version(cls, version_string):
+    # single instance per version string
+    _v = object.__new__(cls)
+    _v._parse(version_string)
+    return _v
+
+
+class DebianVersion(object):
+    """Parsed Debian package version
+
+    Instances are interned and shared, i.e. equal version strings
+    produce the same object. Do not store per-comparison data here,
+    use VersionCmpResult for that.
+    """
+    __slots__ = (
+        "epoch",
+        "upstream",
+        "upstream_rev",
+        "debian",
+        "debian_rev",
+        "version",
+        "_key",
+        "_debian_lex"
+    )
 
     @staticmethod
     def split_revision(version_fragment):
@@ -122,14 +161,22 @@ class DebianVersion(object):
             _rev = version_fragment[_indices[0]:]
             return _main, _rev
 
-    def __init__(self, version_string):
+    def __new__(cls, version_string):
+        return _intern_version(cls, version_string)
+
+    @staticmethod
+    def cache_info():
+        return _intern_version.cache_info()
+
+    def _parse(self, version_string):
         # save
         if len(version_string) < 1:
             self.epoch = "0"
             self.upstream = "0"
+            self.upstream_rev = ""
             self.debian = ''
+            self.debian_rev = ""
             self.version = 'n/a'
-            return
         else:
             # do parse the main versions
             _v = version_string
@@ -146,133 +193,88 @@ class DebianVersion(object):
             self.upstream, self.upstream_rev = self.split_revision(_m)
             self.debian, self.debian_rev = self.split_revision(_d)
             self.version = version_string
+        # Sort key is a freestyle python mimic of apt's upstream, enjoy
+        # https://github.com/chaos/apt/blob/master/apt/apt-pkg/deb/debversion.cc#L42
+        # mimic produced in order not to pull packages or call external code
+        # Main part compared using splitted numbers,
+        # if equal, revision is compared using lexical comparison.
+        # Tuples compare item by item and longer one is later
+        # when all items are equal, exactly as fragments should
+        self._key = (
+            _split_num(self.epoch),
+            _split_num(self.upstream),
+            _split_lex(self.upstream_rev),
+            _split_num(self.debian),
+            _split_lex(self.debian_rev)
+        )
+        # debian part statuses use lexical comparison
+        self._debian_lex = _split_lex(self.debian)
 
-    # Following functions is a freestyle python mimic of apt's upstream, enjoy
-    # https://github.com/chaos/apt/blob/master/apt/apt-pkg/deb/debversion.cc#L42
-    # mimic produced in order not to pull any packages or call external code
-    @staticmethod
-    def _cmp_fragment(lhf, rhf):
-        # search for difference
-        # indices
-        _li = _ri = 0
-        # pre-calc len
-        _lL = len(lhf)
-        _rL = len(rhf)
-        # bool for compare found
-        _diff = False
-        while _li < _lL and _ri < _rL:
-            # iterate lists
-            _num = lhf[_li] - rhf[_ri]
-            if _num:
-                return _num
-            _li += 1
-            _ri += 1
-
-        # diff found? lens equal?
-        if not _diff and _lL != _rL:
-            # lens not equal? Longer - later
-            return _lL - _rL
-        else:
-            # equal
-            return 0
-
-    def _cmp_num(self, lf, rf):
-        # split fragments into lists
-        _lhf = lf.split('.') if '.' in lf else list(lf)
-        _rhf = rf.split('.') if '.' in rf else list(rf)
-        # cast them to ints, delete empty strs
-        _lhf = [int(n) for n in _lhf if len(n)]
-        _rhf = [int(n) for n in _rhf if len(n)]
-
-        return self._cmp_fragment(_lhf, _rhf)
-
-    def _cmp_lex(self, lf, rf):
-        def split_rev(_s):
-            _out = []
-            _list = re.split(r'(\d+)', _s)
-            # iterate and cast into num of possible
-            for idx in range(0, len(_list)):
-                try:
-                    # try to convert it to number
-                    _out.append(int(_list[idx]))
-                except ValueError:
-                    # not a number
-                    _ords = [ord(n) for n in _list[idx]]
-                    _out += _ords
-            return _out
-        # split string into letters and numbers
-        # and cast each item into its ORD value
-        _lhf = split_rev(lf)
-        _rhf = split_rev(rf)
-        # _lhf = [ord(n) for n in lf]
-        # _rhf = [ord(n) for n in rf]
-
-        return self._cmp_fragment(_lhf, _rhf)
-    # end of cmps
-
-    # main part compared using splitted numbers
-    # if equal, revision is compared using lexical comparizon
     def __lt__(self, v):
-        _e = self._cmp_num(self.epoch, v.epoch)
-        _u = self._cmp_num(self.upstream, v.upstream)
-        _ul = self._cmp_lex(self.upstream_rev, v.upstream_rev)
-        _d = self._cmp_num(self.debian, v.debian)
-        _dl = self._cmp_lex(self.debian_rev, v.debian_rev)
-        for n in [_e, _u, _ul, _d, _dl]:
-            if n == 0:
-                continue
-            elif n < 0:
-                return True
-            elif n > 0:
-                return False
-        # if all is equal, it is still false
-        return False
+        return self._key < v._key
 
     def __eq__(self, v):
-        # compare all portions
-        _result = []
-        _result.append(self._cmp_num(self.epoch, v.epoch))
-        _result.append(self._cmp_num(self.upstream, v.upstream))
-        _result.append(self._cmp_lex(self.upstream_rev, v.upstream_rev))
-        _result.append(self._cmp_num(self.debian, v.debian))
-        _result.append(self._cmp_lex(self.debian_rev, v.debian_rev))
-        # if there is any non-zero, its not equal
-        return not any(_result)
-
-    def __gt__(self, v):
-        _e = self._cmp_num(self.epoch, v.epoch)
-        _u = self._cmp_num(self.upstream, v.upstream)
-        _ul = self._cmp_lex(self.upstream_rev, v.upstream_rev)
-        _d = self._cmp_num(self.debian, v.debian)
-        _dl = self._cmp_lex(self.debian_rev, v.debian_rev)
-        for n in [_e, _u, _ul, _d, _dl]:
-            if n == 0:
-                continue
-            elif n > 0:
-                return True
-            elif n < 0:
-                return False
-        # if all is equal, it is still false
-        return False
-
-    def update_parts(self, target, status):
-        # updating parts of version statuses
-        if self._cmp_num(self.epoch, target.epoch) != 0:
-            self.epoch_status = status
-        else:
-            self.epoch_status = const.VERSION_OK
+        return self._key == v._key
 
-        if self._cmp_num(self.upstream, target.upstream) != 0 \
-                or self._cmp_lex(self.upstream_rev, target.upstream_rev) != 0:
-            self.upstream_status = status
-        else:
-            self.upstream_status = const.VERSION_OK
+    def __ne__(self, v):
+        return self._key != v._key
 
-        if self._cmp_lex(self.debian, target.debian) != 0 \
-                or self._cmp_lex(self.debian_rev, target.debian_rev) != 0:
-            self.debian_status = status
-        else:
-            self.debian_status = const.VERSION_OK
+    def __gt__(self, v):
+        return self._key > v._key
+
+    def __hash__(self):
+        return hash(self._key)
+
+    def diff_parts(self, target):
+        # which parts of versions differ: epoch, upstream, debian
+        _k = self._key
+        _t = target._key
+        return (
+            _k[0] != _t[0],
+            _k[1] != _t[1] or _k[2] != _t[2],
+            self._debian_lex != target._debian_lex or _k[4] != _t[4]
+        )
+
+
+# Status, action and target for (I vs C, I vs R, C vs R) signs
+# Target 'c' is a candidate version, 'r' is a release one
+_cmp_table = {
+    # I < C, installed version is older
+    # installed and repo versions older vs release version
+    (-1, -1, -1): (const.VERSION_WARN, const.ACT_REPO, 'c'),
+    # installed version is older vs release version
+    (-1, -1, 0): (const.VERSION_WARN, const.ACT_NEED_UP, 'c'),
+    (-1, -1, 1): (const.VERSION_WARN, const.ACT_NEED_UP, 'r'),
+    # installed version is equal vs release version
+    (-1, 0, 1): (const.VERSION_OK, const.ACT_UPGRADE, 'c'),
+    # installed version is newer vs release version
+    (-1, 1, 1): (const.VERSION_UP, const.ACT_UPGRADE, 'c'),
+    # I = C
+    # installed and linked repo is inline, new target possible
+    (0, -1, -1): (const.VERSION_OK, const.ACT_REPO, 'r'),
+    # all is ok
+    (0, 0, 0): (const.VERSION_OK, const.ACT_NA, 'c'),
+    # both are newer, same target
+    (0, 1, 1): (const.VERSION_WARN, const.ACT_REPO, 'c'),
+    # I > C, installed version is newer
+    # both repo and installed older vs release, new target
+    (1, -1, -1): (const.VERSION_DOWN, const.ACT_REPO, 'r'),
+    # repo is older vs release, but release version installed
+    (1, 0, -1): (const.VERSION_OK, const.ACT_REPO, 'c'),
+    # repo is older vs release and both older vs installed
+    (1, 1, -1): (const.VERSION_UP, const.ACT_REPO, 'c'),
+    # some unknown version installed
+    (1, 1, 0): (const.VERSION_WARN, const.ACT_NEED_DOWN, 'c'),
+    # installed and repo versions newer than release
+    (1, 1, 1): (const.VERSION_UP, const.ACT_NEED_DOWN, 'c')
+}
+
+# Status and action for I vs C sign, when no release version present
+_cmp_no_release_table = {
+    -1: (const.VERSION_OK, const.ACT_UPGRADE),
+    0: (const.VERSION_OK, const.ACT_NA),
+    1: (const.VERSION_UP, const.ACT_NEED_DOWN)
+}
 
 
 class VersionCmpResult(object):
@@ -282,93 +284,41 @@ class VersionCmpResult(object):
     source = None
     target = None
 
+    # statuses for parts of the source version
+    epoch_status = const.VERSION_NA
+    upstream_status = const.VERSION_NA
+    debian_status = const.VERSION_NA
+
     def __init__(self, i, c, r):
         # compare three versions and write a result
         self.source = i
-        self.status = const.VERSION_NA
-        self.action = const.ACT_NA
+        self.target = c
+        # signs are -1, 0 or 1, keys are precomputed at parsing
+        _ik = i._key
+        _ck = c._key
+        _ic = (_ik > _ck) - (_ik < _ck)
 
         # Check if there is a release version present
         if r and len(r.version) > 0 and r.version != 'n/a':
-            # I < C, installed version is older
-            if i < c:
-                self.target = c
-                if i == r:
-                    # installed version is equal vs release version
-                    self.status = const.VERSION_OK
-                    self.action = const.ACT_UPGRADE
-                elif i > r:
-                    # installed version is newer vs release version
-                    self.status = const.VERSION_UP
-                    self.action = const.ACT_UPGRADE
-                elif i < r and r < c:
-                    # installed version is older vs release version
-                    self.status = const.VERSION_WARN
-                    self.action = const.ACT_NEED_UP
-                    self.target = r
-                elif i < r and c == r:
-                    # installed version is older vs release version
-                    self.status = const.VERSION_WARN
-                    self.action = const.ACT_NEED_UP
-                    self.target = c
-                elif c < r:
-                    # installed and repo versions older vs release version
-                    self.status = const.VERSION_WARN
-                    self.action = const.ACT_REPO
-            # I > C
-            # installed version is newer
-            elif i > c:
-                self.target = c
-                if c == r:
-                    # some unknown version installed
-                    self.status = const.VERSION_WARN
-                    self.action = const.ACT_NEED_DOWN
-                elif c > r:
-                    # installed and repo versions newer than release
-                    self.status = const.VERSION_UP
-                    self.action = const.ACT_NEED_DOWN
-                elif c < r and r < i:
-                    # repo is older vs release and both older vs installed
-                    self.status = const.VERSION_UP
-                    self.action = const.ACT_REPO
-                elif c < r and r == i:
-                    # repo is older vs release, but release version installed
-                    self.status = const.VERSION_OK
-                    self.action = const.ACT_REPO
-                elif i < r:
-                    # both repo and installed older vs release, new target
-                    self.status = const.VERSION_DOWN
-                    self.action = const.ACT_REPO
-                    self.target = r
-            # I = C
-            # installed and linked repo is inline,
-            elif i == c:
-                self.target = c
-                if i < r:
-                    # both are intact, new target possible
-                    self.status = const.VERSION_OK
-                    self.action = const.ACT_REPO
-                    self.target = r
-                elif i > r:
-                    # both are newer, same target
-                    self.status = const.VERSION_WARN
-                    self.action = const.ACT_REPO
-                elif i == r:
-                    # all is ok
-                    self.status = const.VERSION_OK
-                    self.action = const.ACT_NA
+            # single pass ordering of all three versions
+            _rk = r._key
+            self.status, self.action, _target = _cmp_table[(
+                _ic,
+                (_ik > _rk) - (_ik < _rk),
+                (_ck > _rk) - (_ck < _rk)
+            )]
+            if _target == 'r':
+                self.target = r
         else:
             # no release version present
-            self.target = c
-            if i < c:
-                self.status = const.VERSION_OK
-                self.action = const.ACT_UPGRADE
-            elif i > c:
-                self.status = const.VERSION_UP
-                self.action = const.ACT_NEED_DOWN
-            elif i == c:
-                self.status = const.VERSION_OK
-                self.action = const.ACT_NA
+            self.status, self.action = _cmp_no_release_table[_ic]
 
         # and we need to update per-part status
-        self.source.update_parts(self.target, self.status)
+        self.update_parts(self.target, self.status)
+
+    def update_parts(self, target, status):
+        # updating statuses of the source version parts
+        _e, _u, _d = self.source.diff_parts(target)
+        self.epoch_status = status if _e else const.VERSION_OK
+        self.upstream_status = status if _u else const.VERSION_OK
+        self.debian_status = status if _d else const.VERSION_OK
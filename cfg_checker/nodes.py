@@ -1,9 +1,13 @@
+import base64
+import gzip
 import json
 import os
+import time
 from copy import deepcopy
 
 from cfg_checker.clients import get_salt_remote, salt
 from cfg_checker.common import config
+from cfg_checker.common.const import _compressed_output_header
 from cfg_checker.common.const import all_roles_map
 from cfg_checker.common.const import NODE_UP, NODE_DOWN, NODE_SKIP
 from cfg_checker.common import logger, logger_cli
@@ -27,13 +31,48 @@ class SaltNodes(object):
         self.salt = salt
         self.nodes = None
 
-    def gather_node_info(self, skip_list, skip_list_file):
+    def _load_inventory(self):
+        """Loads node inventory snapshot saved by previous run
+
+        :return: inventory dict or None if there is none to use
+        """
+        _file = config.inventory_file
+        if config.refresh_inventory or not config.inventory_ttl:
+            return None
+        elif not os.path.isfile(_file):
+            return None
+        try:
+            with open(_file) as _f:
+                _inventory = json.load(_f)
+        except (IOError, ValueError):
+            logger_cli.debug(
+                "... failed to load node inventory from '{}'".format(_file)
+            )
+            return None
+        # snapshot should be for the same salt master
+        if _inventory.get('uri') != self.salt.uri:
+            return None
+        return _inventory
+
+    def _save_inventory(self, inventory):
+        _file = config.inventory_file
+        inventory['uri'] = self.salt.uri
+        try:
+            with open(_file, 'w') as _f:
+                json.dump(inventory, _f)
+            logger_cli.debug("... node inventory saved to '{}'".format(_file))
+        except IOError as e:
+            logger_cli.debug(
+                "... failed to save node inventory to '{}': {}".format(
+                    _file,
+                    e.strerror
+                )
+            )
+
+    def _discover_nodes(self):
         # Keys for all nodes
         # this is not working in scope of 2016.8.3, will overide with list
         logger_cli.debug("... collecting node names existing in the cloud")
-        if not self.salt:
-            self.salt = get_salt_remote(config)
-
         try:
             _keys = self.salt.list_keys()
             _str = []
@@ -41,12 +80,9 @@ class SaltNodes(object):
                 _str.append("{}: {}".format(_k, len(_v)))
             logger_cli.info("-> keys collected: {}".format(", ".join(_str)))
 
-            self.node_keys = {
-                'minions': _keys['minions']
-            }
+            _minion_keys = _keys['minions']
         except Exception:
-            _keys = None
-            self.node_keys = None
+            _minion_keys = None
 
         # List of minions with grains
         _minions = self.salt.list_minions()
@@ -54,14 +90,89 @@ class SaltNodes(object):
             logger_cli.info(
                 "-> api reported {} active minions".format(len(_minions))
             )
-        elif not self.node_keys:
+        elif not _minion_keys:
             # this is the last resort
             _minions = config.load_nodes_list()
             logger_cli.info(
                 "-> {} nodes loaded from list file".format(len(_minions))
             )
         else:
-            _minions = self.node_keys['minions']
+            _minions = _minion_keys
+
+        # in case API not listed minions, we need all that answer ping
+        _active = self.salt.get_active_nodes()
+        logger_cli.info("-> nodes responded: {}".format(len(_active)))
+        return {
+            'timestamp': time.time(),
+            'keys': _minion_keys,
+            'minions': list(_minions),
+            'active': _active,
+            'pillars': {}
+        }
+
+    def _refresh_inventory(self, inventory):
+        """Incremental refresh of the inventory snapshot.
+        Minion list is updated from changed keys and all of the minions
+        are pinged again, pillars are fetched later for new ones only.
+        Discovery time is kept, so the snapshot still expires
+
+        :return: updated inventory
+        """
+        logger_cli.debug("... refreshing node inventory")
+        try:
+            _keys = self.salt.list_keys()['minions']
+        except Exception:
+            _keys = None
+        if _keys is None or inventory['keys'] is None:
+            # no keys to compare, do it the long way
+            return self._discover_nodes()
+
+        _added = sorted(set(_keys) - set(inventory['keys']))
+        _removed = set(inventory['keys']) - set(_keys)
+        logger_cli.info(
+            "-> inventory refreshed: {} keys added, {} removed".format(
+                len(_added),
+                len(_removed)
+            )
+        )
+        _minions = [_m for _m in inventory['minions'] if _m not in _removed]
+        for _m in _removed:
+            inventory['pillars'].pop(_m, None)
+        _minions.extend([_m for _m in _added if _m not in _minions])
+        # nodes could go up or down since the last run
+        _active = self.salt.get_active_nodes(nodes=_minions)
+        logger_cli.info("-> nodes responded: {}".format(len(_active)))
+        inventory.update({
+            'keys': _keys,
+            'minions': _minions,
+            'active': _active
+        })
+        return inventory
+
+    def gather_node_info(self, skip_list, skip_list_file):
+        if not self.salt:
+            self.salt = get_salt_remote(config)
+
+        # Use inventory snapshot from previous runs when possible
+        _inventory = self._load_inventory()
+        if not _inventory or \
+                time.time() - _inventory['timestamp'] >= config.inventory_ttl:
+            _inventory = self._discover_nodes()
+        else:
+            logger_cli.info(
+                "-> using node inventory discovered {:.0f}s ago".format(
+                    time.time() - _inventory['timestamp']
+                )
+            )
+            _inventory = self._refresh_inventory(_inventory)
+
+        if _inventory['keys'] is not None:
+            self.node_keys = {
+                'minions': _inventory['keys']
+            }
+        else:
+            self.node_keys = None
+        _minions = _inventory['minions']
 
         # Skip nodes if needed
         _skipped_minions = []
@@ -90,7 +201,7 @@ class SaltNodes(object):
                     _list.extend(_nodes)
                 else:
                     if _item in _minions:
-                        _list += _item
+                        _list.append(_item)
                     else:
                         logger_cli.warn(
                             "# WARNING: No node found for {}".format(_item)
@@ -99,9 +210,7 @@ class SaltNodes(object):
             _list = list(set(_list))
             _skipped_minions.extend(_list)
 
-        # in case API not listed minions, we need all that answer ping
-        _active = self.salt.get_active_nodes()
-        logger_cli.info("-> nodes responded: {}".format(len(_active)))
+        _active = _inventory['active']
         # iterate through all accepted nodes and create a dict for it
         self.nodes = {}
         self.skip_list = []
@@ -160,19 +269,53 @@ class SaltNodes(object):
         else:
             self.salt.master_node = _filtered[0]
 
-        # OpenStack versions
-        self.mcp_release = self.salt.pillar_get(
-            self.salt.master_node,
-            "_param:apt_mk_version"
-        )[self.salt.master_node]
-        self.openstack_release = self.salt.pillar_get(
-            self.salt.master_node,
-            "_param:openstack_version"
-        )[self.salt.master_node]
-        # Preload codenames
-        # do additional queries to get linux codename and arch for each node
-        self.get_specific_pillar_for_nodes("_param:linux_system_codename")
-        self.get_specific_pillar_for_nodes("_param:linux_system_architecture")
+        # OpenStack versions from master
+        # and linux codename and arch for each node in one salt-api call
+        # Releases change on upgrade, so they are always requested,
+        # node pillars only if missing in inventory
+        _master = self.salt.master_node
+        _node_pillars = [
+            "_param:linux_system_codename",
+            "_param:linux_system_architecture"
+        ]
+        _requests = [
+            (_master, 'get', "_param:apt_mk_version"),
+            (_master, 'get', "_param:openstack_version")
+        ]
+        _fetch = [
+            _n for _n, _v in self.nodes.items()
+            if _v['status'] == NODE_UP and _n not in _inventory['pillars']
+        ]
+        if _fetch:
+            _target = self.salt.compound_string_from_list(_fetch)
+            _requests += [(_target, 'get', _p) for _p in _node_pillars]
+        logger_cli.debug(
+            "... collecting release and node pillars: {}".format(
+                ", ".join([_r[2] for _r in _requests])
+            )
+        )
+        _results = self.salt.pillar_request_multi(_requests)
+        self.mcp_release = _results.pop(0)[_master]
+        self.openstack_release = _results.pop(0)[_master]
+        for _node in _fetch:
+            _values = {
+                _p: _r.get(_node)
+                for _p, _r in zip(_node_pillars, _results)
+            }
+            # not responded nodes are asked again next time
+            if all(_values.values()):
+                _inventory['pillars'][_node] = _values
+        self._save_inventory(_inventory)
+
+        self.not_responded = []
+        for _path in _node_pillars:
+            self._save_pillar_for_nodes(
+                _path,
+                {
+                    _n: _inventory['pillars'].get(_n, {}).get(_path)
+                    for _n in self.nodes
+                }
+            )
         for _name in self.nodes.keys():
             _n = self.nodes[_name]
             if _name not in self.skip_list:
@@ -207,20 +350,7 @@ class SaltNodes(object):
         }
         return _info
 
-    def get_cmd_for_nodes(self, cmd, target_key, target_dict=None, nodes=None):
-        """Function runs. cmd.run and parses result into place
-        or into dict structure provided
-
-        :return: no return value, data pulished internally
-        """
-        logger_cli.debug(
-            "... collecting results for '{}'".format(cmd)
-        )
-        if target_dict:
-            _nodes = target_dict
-        else:
-            _nodes = self.nodes
-        _result = self.execute_cmd_on_active_nodes(cmd, nodes=nodes)
+    def _save_cmd_for_nodes(self, cmd, target_key, _nodes, _result):
         for node, data in _nodes.items():
 
             if node in self.skip_list:
@@ -250,16 +380,43 @@ class SaltNodes(object):
             else:
                 data[target_key] = _result[node]
 
-    def get_specific_pillar_for_nodes(self, pillar_path):
-        """Function gets pillars on given path for all nodes
+    def get_cmd_for_nodes(self, cmd, target_key, target_dict=None, nodes=None):
+        """Function runs. cmd.run and parses result into place
+        or into dict structure provided
 
         :return: no return value, data pulished internally
         """
         logger_cli.debug(
-            "... collecting node pillars for '{}'".format(pillar_path)
+            "... collecting results for '{}'".format(cmd)
         )
-        _result = self.salt.pillar_get(self.active_nodes_compound, pillar_path)
-        self.not_responded = []
+        if target_dict:
+            _nodes = target_dict
+        else:
+            _nodes = self.nodes
+        _result = self.execute_cmd_on_active_nodes(cmd, nodes=nodes)
+        self._save_cmd_for_nodes(cmd, target_key, _nodes, _result)
+
+    def get_cmds_for_nodes(self, cmds, target_dict=None, nodes=None):
+        """Batched get_cmd_for_nodes, all commands sent in one salt call
+
+        :param cmds: list of (cmd, target_key) tuples
+        :return: no return value, data pulished internally
+        """
+        logger_cli.debug(
+            "... collecting results for {} commands".format(len(cmds))
+        )
+        if target_dict:
+            _nodes = target_dict
+        else:
+            _nodes = self.nodes
+        _results = self.execute_cmds_on_active_nodes(
+            [_cmd for _cmd, _ in cmds],
+            nodes=nodes
+        )
+        for (_cmd, _key), _result in zip(cmds, _results):
+            self._save_cmd_for_nodes(_cmd, _key, _nodes, _result)
+
+    def _save_pillar_for_nodes(self, pillar_path, _result):
         for node, data in self.nodes.items():
             if node in self.skip_list:
                 logger_cli.debug(
@@ -287,10 +444,41 @@ class SaltNodes(object):
                     )
                 )
                 _data[_pillar_keys[-1]] = None
-                self.not_responded.append(node)
+                if node not in self.not_responded:
+                    self.not_responded.append(node)
             else:
                 _data[_pillar_keys[-1]] = _result[node]
 
+    def get_specific_pillar_for_nodes(self, pillar_path):
+        """Function gets pillars on given path for all nodes
+
+        :return: no return value, data pulished internally
+        """
+        logger_cli.debug(
+            "... collecting node pillars for '{}'".format(pillar_path)
+        )
+        _result = self.salt.pillar_get(self.active_nodes_compound, pillar_path)
+        self.not_responded = []
+        self._save_pillar_for_nodes(pillar_path, _result)
+
+    def get_specific_pillars_for_nodes(self, pillar_paths):
+        """Batched get_specific_pillar_for_nodes, one salt call for all paths
+
+        :return: no return value, data pulished internally
+        """
+        logger_cli.debug(
+            "... collecting node pillars for {}".format(
+                ", ".join(["'{}'".format(_p) for _p in pillar_paths])
+            )
+        )
+        _results = self.salt.pillar_get_multi(
+            self.active_nodes_compound,
+            pillar_paths
+        )
+        self.not_responded = []
+        for _path, _result in zip(pillar_paths, _results):
+            self._save_pillar_for_nodes(_path, _result)
+
     def prepare_json_on_node(self, node, _dict, filename):
         # this function assumes that all folders are created
         _dumps = json.dumps(_dict, indent=2).splitlines()
@@ -384,6 +572,48 @@ class SaltNodes(object):
         # return path on nodes, just in case
         return _target_path
 
+    @staticmethod
+    def decode_script_output(node, value):
+        """Unpacks script output if it was returned compressed,
+        any other value is returned as is
+        """
+        if not isinstance(value, str):
+            return value
+        # stderr is merged into output, so there could be some noise
+        # printed before and after the payload
+        _start = value.find(_compressed_output_header)
+        if _start < 0:
+            return value
+        elif _start > 0:
+            logger.debug(
+                "... '{}' printed before the output:\n{}".format(
+                    node,
+                    value[:_start]
+                )
+            )
+        _header, _payload = value[_start:].split('\n', 1)
+        _raw_size, _packed_size = [int(_v) for _v in _header.split()[1:3]]
+        _payload = _payload[:_packed_size]
+        try:
+            _text = gzip.decompress(base64.b64decode(_payload))
+        except (ValueError, OSError) as e:
+            logger_cli.warning(
+                "# WARNING: failed to unpack output from '{}': {}".format(
+                    node,
+                    e
+                )
+            )
+            return None
+        _text = _text.decode('utf-8')
+        logger_cli.debug(
+            "... '{}' returned {:.1f}KB packed, {:.1f}KB unpacked".format(
+                node,
+                len(value) / 1024.,
+                _raw_size / 1024.
+            )
+        )
+        return _text
+
     def execute_script_on_node(self, node, script_filename, args=[]):
         # Prepare path
         _target_path = os.path.join(
@@ -403,12 +633,25 @@ class SaltNodes(object):
             param='python {} {}'.format(_target_path, _script_arguments),
             expr_form="compound"
         )
+        _r = {_n: self.decode_script_output(_n, _v) for _n, _v in _r.items()}
 
         # all false returns means that there is no response
         self.not_responded = [_n for _n in _r.keys() if not _r[_n]]
         return _r
 
-    def execute_script_on_active_nodes(self, script_filename, args=[]):
+    def execute_script_on_active_nodes(
+        self,
+        script_filename,
+        args=[],
+        callback=None
+    ):
+        """Runs script on all active nodes.
+        When callback is supplied, job is submitted asynchronously and
+        callback(node, result) is called for each node as soon as
+        it returns, while the rest of the nodes are still running
+
+        :return: dict with results per node
+        """
         # Prepare path
         _target_path = os.path.join(
             '/root',
@@ -420,13 +663,33 @@ class SaltNodes(object):
         logger_cli.debug("... running script")
         # handle results for each node
         _script_arguments = " ".join(args) if args else ""
+        _param = 'python {} {}'.format(_target_path, _script_arguments)
         self.not_responded = []
-        _r = self.salt.cmd(
-            self.active_nodes_compound,
-            'cmd.run',
-            param='python {} {}'.format(_target_path, _script_arguments),
-            expr_form="compound"
-        )
+        if callback:
+            _jid = self.salt.cmd_async(
+                self.active_nodes_compound,
+                'cmd.run',
+                param=_param,
+                expr_form="compound"
+            )
+            _r = {}
+            for _node, _value in self.salt.iter_jid_results(_jid):
+                _r[_node] = self.decode_script_output(_node, _value)
+                callback(_node, _r[_node])
+            # nodes that not returned in time treated as not responded
+            for _node, _data in self.nodes.items():
+                if _data['status'] == NODE_UP and _node not in _r:
+                    _r[_node] = False
+        else:
+            _r = self.salt.cmd(
+                self.active_nodes_compound,
+                'cmd.run',
+                param=_param,
+                expr_form="compound"
+            )
+            _r = {
+                _n: self.decode_script_output(_n, _v) for _n, _v in _r.items()
+            }
 
         # all false returns means that there is no response
         self.not_responded = [_n for _n in _r.keys() if not _r[_n]]
@@ -446,6 +709,26 @@ class SaltNodes(object):
         self.not_responded = [_n for _n in _r.keys() if not _r[_n]]
         return _r
 
+    def execute_cmds_on_active_nodes(self, cmds, nodes=None):
+        # execute all cmds in a single salt-api request
+        self.not_responded = []
+        _target = nodes if nodes else self.active_nodes_compound
+        _results = self.salt.multi_cmd([
+            self.salt.lowstate(
+                _target,
+                'cmd.run',
+                param=_cmd,
+                expr_form="compound"
+            ) for _cmd in cmds
+        ])
+
+        # all false returns means that there is no response
+        _not_responded = set()
+        for _r in _results:
+            _not_responded.update([_n for _n in _r.keys() if not _r[_n]])
+        self.not_responded = list(_not_responded)
+        return _results
+
     def is_node_available(self, node, log=True):
         if node in self.skip_list:
             if log:
@@ -259,10 +259,6 @@ class HTMLNetworkReport(_TMPLBase):
         def _lscpu(_dict):
             _key = "lscpu"
             _key_r = "lscpu_raw"
-            # get all of the values
-            _f_cmd = salt_master.get_cmd_for_nodes
-            _cmd = "lscpu | sed -n '/\\:/s/ \\+/ /gp'"
-            _f_cmd(_cmd, _key_r, target_dict=_dict)
             # parse them and put into dict
             for node, dt in _dict.items():
                 dt[_key] = {}
@@ -290,9 +286,6 @@ class HTMLNetworkReport(_TMPLBase):
         def _free(_dict):
             _key = "ram"
             _key_r = "ram_raw"
-            _f_cmd = salt_master.get_cmd_for_nodes
-            _cmd = "free -h | sed -n '/Mem/s/ \\+/ /gp'"
-            _f_cmd(_cmd, _key_r, target_dict=_dict)
             # parse them and put into dict
             for node, dt in _dict.items():
                 dt[_key] = {}
@@ -323,9 +316,6 @@ class HTMLNetworkReport(_TMPLBase):
         def _services(_dict):
             _key = "services"
             _key_r = "services_raw"
-            _f_cmd = salt_master.get_cmd_for_nodes
-            _cmd = "service --status-all"
-            _f_cmd(_cmd, _key_r, target_dict=_dict)
             for node, dt in _dict.items():
                 dt[_key] = {}
                 if dt['status'] == DOWN or dt['status'] == SKIP:
@@ -383,12 +373,6 @@ class HTMLNetworkReport(_TMPLBase):
         def _soft_net_stats(_dict):
             _key = "net_stats"
             _key_r = "net_stats_raw"
-            _f_cmd = salt_master.get_cmd_for_nodes
-            _cmd = "cat /proc/net/softnet_stat; echo \\#; " \
-                "sleep {}; cat /proc/net/softnet_stat".format(
-                    _softnet_interval
-                )
-            _f_cmd(_cmd, _key_r, target_dict=_dict)
             for node, dt in _dict.items():
                 _cpuindex = 1
                 _add_mode = True
@@ -464,10 +448,27 @@ class HTMLNetworkReport(_TMPLBase):
                         )
         }
 
-        # get kernel version
-        salt_master.get_cmd_for_nodes(
-            "uname -r",
-            "kernel",
+        # collect raw node data using single salt-api request
+        salt_master.get_cmds_for_nodes(
+            [
+                # kernel version
+                ("uname -r", "kernel"),
+                ("lscpu | sed -n '/\\:/s/ \\+/ /gp'", "lscpu_raw"),
+                ("free -h | sed -n '/Mem/s/ \\+/ /gp'", "ram_raw"),
+                (
+                    "df -h | sed -n '/^\\/dev/s/ \\+/ /gp' | "
+                    "cut -d\" \" -f 1-5",
+                    "disk_raw"
+                ),
+                ("service --status-all", "services_raw"),
+                (
+                    "cat /proc/net/softnet_stat; echo \\#; "
+                    "sleep {}; cat /proc/net/softnet_stat".format(
+                        _softnet_interval
+                    ),
+                    "net_stats_raw"
+                )
+            ],
             target_dict=data["nodes"]
         )
         # process lscpu data
@@ -481,11 +482,6 @@ class HTMLNetworkReport(_TMPLBase):
         # sample: /dev/vda1 78G 33G 45G 43%
         _key = "disk"
         _key_r = "disk_raw"
-        salt_master.get_cmd_for_nodes(
-            "df -h | sed -n '/^\\/dev/s/ \\+/ /gp' | cut -d\" \" -f 1-5",
-            "disk_raw",
-            target_dict=data["nodes"]
-        )
         for dt in data["nodes"].values():
             dt["disk"] = {}
             dt["disk_max_dev"] = None
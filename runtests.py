@@ -30,7 +30,11 @@ def _cleanup():
     _fpath = [
         "repo.info.tgz",
         "repo.versions.tgz",
-        "pkg.descriptions.tgz"
+        "pkg.descriptions.tgz",
+        "repo.info.zip",
+        "repo.versions.zip",
+        "pkg.descriptions.zip",
+        "http.cache.json"
     ]
     for _p in _fpath:
         _fp = os.path.join(_res_dir, _p)
@@ -1,8 +1,21 @@
+import base64
 import json
 import subprocess
 import sys
+import zlib
 from multiprocessing.dummy import Pool
 
+try:
+    # python-apt lists installed packages with no forks at all
+    import apt_pkg
+except ImportError:
+    apt_pkg = None
+
+# packages per single 'apt-cache policy' call
+_chunk_size = 200
+# same as in cfg_checker.common.const
+_compressed_output_header = "#cfg-checker-gzip-b64"
+
 
 def shell(command):
     _ps = subprocess.Popen(
@@ -13,31 +26,112 @@ def shell(command):
     return _ps
 
 
-def get_versions(pkg):
-    # get the info for the package
-    _pkg_info = shell('apt-cache policy ' + pkg)
+def shell_args(args):
+    # no splitting, arguments passed as is
+    _ps = subprocess.Popen(
+        args,
+        stdout=subprocess.PIPE
+    ).communicate()[0].decode()
+
+    return _ps
+
 
+def extract_versions(pkg_info):
     _installed = 'none'
     _candidate = 'none'
 
     # extract the installed and candidate
-    for line in _pkg_info.splitlines():
+    for line in pkg_info.splitlines():
         if line.find("Installed") > 0:
             _installed = line.split(':', 1)[1].strip()
         elif line.find("Candidate") > 0:
             _candidate = line.split(':', 1)[1].strip()
+    return _installed, _candidate
+
+
+def get_versions(pkg):
+    # get the info for the package
+    _pkg_info = shell('apt-cache policy ' + pkg)
+    _installed, _candidate = extract_versions(_pkg_info)
     return [pkg, _installed, _candidate, _pkg_info]
 
 
-# get list of packages
-_list = shell("apt list --installed")
-pkg_list = _list.splitlines()
-pkg_list = [_pkg.split('/')[0] for _pkg in pkg_list[1:]]
+def get_installed_list():
+    if apt_pkg:
+        apt_pkg.init()
+        _cache = apt_pkg.Cache(None)
+        _pkgs = [_p.name for _p in _cache.packages if _p.current_ver]
+        return sorted(set(_pkgs))
+    # single dpkg-query call for all installed packages
+    _list = shell_args([
+        "dpkg-query",
+        "-W",
+        "-f=${Status}\t${Package}\n"
+    ])
+    _pkgs = set()
+    for _line in _list.splitlines():
+        if '\t' not in _line:
+            continue
+        _status, _pkg = _line.split('\t', 1)
+        if _status.endswith(" installed"):
+            _pkgs.add(_pkg)
+    return sorted(_pkgs)
+
+
+def get_versions_bulk(pkg_list):
+    # 'apt-cache policy' accepts many packages at once
+    # output is split back using package header lines, i.e. 'name:'
+    _result = []
+    for _idx in range(0, len(pkg_list), _chunk_size):
+        _chunk = pkg_list[_idx:_idx + _chunk_size]
+        _policy = shell_args(["apt-cache", "policy"] + _chunk)
+        _blocks = {}
+        _pkg = None
+        for _line in _policy.splitlines():
+            if _line and not _line[0].isspace() and _line.endswith(':'):
+                _pkg = _line[:-1]
+                _blocks[_pkg] = [_line]
+            elif _pkg:
+                _blocks[_pkg].append(_line)
+        for _pkg in _chunk:
+            if _pkg not in _blocks:
+                # not listed in bulk output, ask for it alone
+                _result.append(get_versions(_pkg))
+                continue
+            _pkg_info = "\n".join(_blocks[_pkg]) + "\n"
+            _installed, _candidate = extract_versions(_pkg_info)
+            _result.append([_pkg, _installed, _candidate, _pkg_info])
+    return _result
+
+
+def write_output(buff, compress=False):
+    if not compress:
+        sys.stdout.write(buff)
+        return
+    # gzip container via zlib, works the same on python 2 and 3
+    _raw = buff.encode('utf-8')
+    _gz = zlib.compressobj(9, zlib.DEFLATED, 31)
+    _packed = base64.b64encode(_gz.compress(_raw) + _gz.flush())
+    sys.stdout.write("{} {} {}\n".format(
+        _compressed_output_header,
+        len(_raw),
+        len(_packed)
+    ))
+    sys.stdout.write(_packed.decode('ascii'))
+
+
+if "--per-package" in sys.argv:
+    # get list of packages
+    _list = shell("apt list --installed")
+    pkg_list = _list.splitlines()
+    pkg_list = [_pkg.split('/')[0] for _pkg in pkg_list[1:]]
 
-# threading pool
-pool = Pool(10)
+    # threading pool
+    pool = Pool(10)
 
-result = pool.map(get_versions, pkg_list)
+    result = pool.map(get_versions, pkg_list)
+else:
+    result = get_versions_bulk(get_installed_list())
 
 # init pkg storage
 pkgs = {}
@@ -50,4 +144,4 @@ for res in result:
     pkgs[_pkg]['raw'] = res[3]
 
 buff = json.dumps(pkgs)
-sys.stdout.write(buff)
+write_output(buff, compress="--compress" in sys.argv)
@@ -0,0 +1,10 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+# files cached between runs, like salt-api token,
+# are kept in a temporary work folder, not in the package
+_work_dir = tempfile.mkdtemp(prefix="cfg_checker_tests_")
+os.environ["CFG_TESTS_WORK_DIR"] = _work_dir
+atexit.register(shutil.rmtree, _work_dir, True)
@@ -1,8 +1,12 @@
+import base64
+import gzip
 import json
 import os
 
 from tests.test_base import tests_dir
 
+from cfg_checker.common.const import _compressed_output_header
+
 
 # Prepare fake filenames and files
 _res_dir = os.path.join(tests_dir, 'res')
@@ -23,6 +27,7 @@ _fakepage_empty = _load_from_res(os.path.join(_res_dir, "_fakeempty.html"))
 _fake_keys = json.loads(_load_from_res("_fake_keys.json"))
 _fake_pkg_versions = _load_from_res("_fake_pkg_versions.json")
 _fake_network_data = _load_from_res("_fake_net_data.json")
+_fake_apt_policy = _load_from_res("_fake_apt_policy.txt")
 
 
 def _prepare_result_for_target(_tgt, result=True):
@@ -43,6 +48,18 @@ def _prepare_result_for_target(_tgt, result=True):
     return _m
 
 
+def _compress_output(_text):
+    # same framing as node-side scripts use
+    _raw = _text.encode('utf-8')
+    _packed = base64.b64encode(gzip.compress(_raw)).decode('ascii')
+    return "{} {} {}\n{}".format(
+        _compressed_output_header,
+        len(_raw),
+        len(_packed),
+        _packed
+    )
+
+
 class MockResponse:
     def __init__(self, _buffer, status_code):
         if _buffer is None:
@@ -72,6 +89,13 @@ class MockResponse:
     def text(self):
         return self.text
 
+    def iter_content(self, chunk_size=1):
+        for _idx in range(0, len(self.content), chunk_size):
+            yield self.content[_idx:_idx + chunk_size]
+
+    def close(self):
+        pass
+
     def json(self):
         if not self._json:
             try:
@@ -92,6 +116,10 @@ class MockResponse:
         return None
 
 
+# results of async jobs, jid -> {minion: result}
+_fake_jobs = {}
+
+
 def mocked_salt_post(*args, **kwargs):
     _rest_handle = args[0].split('/', 3)[3]
     if _rest_handle == "login":
@@ -122,9 +150,26 @@ def mocked_salt_post(*args, **kwargs):
         _funs = kwargs["json"]
         if isinstance(_funs, list):
             if len(_funs) > 1:
-                raise Exception("Multiple commands in sale requiest")
+                # batched lowstates, answer each one in order
+                _result = {"return": []}
+                for _fun in _funs:
+                    _r = mocked_salt_post(*args, json=[_fun])
+                    _result["return"].extend(_r.json()["return"])
+                return MockResponse(_result, 200)
             else:
                 _f = _funs[0]
+        if _f.get("client") == "runner" and _f["fun"] == "jobs.lookup_jid":
+            # async job results
+            _val = _fake_jobs.get(_f["kwarg"]["jid"], {})
+            return MockResponse({"return": [_val]}, 200)
+        elif _f.get("client") == "local_async":
+            # run it synchronously and save results for the lookup
+            _sync = dict(_f, client="local")
+            _val = mocked_salt_post(*args, json=[_sync]).json()["return"][0]
+            _jid = "2099{:016d}".format(len(_fake_jobs))
+            _fake_jobs[_jid] = _val
+            _job = {"jid": _jid, "minions": list(_val.keys())}
+            return MockResponse({"return": [_job]}, 200)
         _t = _f["tgt"]
         _a = _f["arg"] if "arg" in _f else ""
         _f = _f["fun"]
@@ -153,7 +198,13 @@ def mocked_salt_post(*args, **kwargs):
             # determine which script is called
             _args = _a.split()
             if _args[0] == "python" and _args[1].endswith("pkg_versions.py"):
-                _val = _prepare_result_for_target(_t, _fake_pkg_versions)
+                if "--compress" in _args:
+                    _val = _prepare_result_for_target(
+                        _t,
+                        _compress_output(_fake_pkg_versions)
+                    )
+                else:
+                    _val = _prepare_result_for_target(_t, _fake_pkg_versions)
             elif _args[0] == "python" and _args[1].endswith("ifs_data.py"):
                 _val = _prepare_result_for_target(_t, _fake_network_data)
             elif _args[0] == "uname":
@@ -269,6 +320,9 @@ def mocked_package_get(*args, **kwargs):
             # preload file
             _gzfile = _load_from_res("Packages.gz", mode='rb')
             return MockResponse(_gzfile, 200)
+        elif _current_page == "Release":
+            # suite's Release file
+            return MockResponse(_load_from_res("Release"), 200)
         elif _current_page == "hotfix" or _current_page == "update":
             return MockResponse(_fakepage_empty, 200)
 
@@ -290,3 +344,58 @@ def mocked_shell(*args, **kwargs):
             return json.dumps(_json)
 
     return "emptyfakeresponse"
+
+
+class MockPopen(object):
+    def __init__(self, stdout):
+        self.stdout = stdout
+
+    def communicate(self):
+        return self.stdout.encode(), None
+
+
+def _split_apt_policy(text):
+    # package name -> its block of 'apt-cache policy' output
+    _blocks = {}
+    _pkg = None
+    for _line in text.splitlines():
+        if not _line[0].isspace():
+            _pkg = _line[:-1]
+            _blocks[_pkg] = ""
+        _blocks[_pkg] += _line + "\n"
+    return _blocks
+
+
+def mocked_apt_popen(*args, **kwargs):
+    # node-side commands used by pkg_versions.py
+    _args = args[0]
+    _blocks = _split_apt_policy(_fake_apt_policy)
+    # packages not in captured output have the same block
+    _template = _blocks["fakepackage-o"]
+    _installed = ["fakepackage", "fakepackage-m", "fakepackage-o"] + \
+        ["fakefiller{:03d}".format(_i) for _i in range(200)]
+    if _args[0] == "dpkg-query":
+        _out = "deinstall ok config-files\tfakepackage-removed\n"
+        _out += "".join(
+            "install ok installed\t{}\n".format(_p) for _p in _installed
+        )
+    elif _args[0] == "apt":
+        _out = "Listing... Done\n"
+        _out += "".join(
+            "{}/xenial,now 1.0 amd64 [installed]\n".format(_p)
+            for _p in _installed
+        )
+    elif _args[:2] == ["apt-cache", "policy"]:
+        _pkgs = _args[2:]
+        if len(_pkgs) > 1:
+            # bulk output lacks the header of 'fakepackage-m'
+            _pkgs = [_p for _p in _pkgs if _p != "fakepackage-m"]
+        _out = "".join(
+            _blocks.get(
+                _p,
+                _template.replace("fakepackage-o", _p)
+            ) for _p in _pkgs
+        )
+    else:
+        _out = ""
+    return MockPopen(_out)
@@ -1,9 +1,18 @@
 import inspect
+import io
+import json
 import os
+import shutil
 import sys
+import tarfile
+import tempfile
+import time
+import zipfile
 from unittest import mock
 
 
+from tests.mocks import MockResponse, mocked_salt_post
+from tests.mocks import mocked_shell, _shell_salt_path
 from tests.test_base import CfgCheckerTestBase
 from tests.test_base import tests_dir
 
@@ -23,6 +32,13 @@ def mocked_requests_get(*args, **kwargs):
         def content(self):
             return self.content
 
+        def iter_content(self, chunk_size=1):
+            for _idx in range(0, len(self.content), chunk_size):
+                yield self.content[_idx:_idx + chunk_size]
+
+        def close(self):
+            pass
+
     if args[0] == fake_gzip_file_path:
         return MockResponse(_patch_buf, 200)
 
@@ -206,3 +222,307 @@ class TestCommonModules(CfgCheckerTestBase):
             _fakecontent,
             "Incorrect content returned by 'get_gzipped_file'"
         )
+
+    def test_gunzip_lines(self):
+        _m = self._try_import("cfg_checker.common.file_utils")
+        _futils = _m.common.file_utils
+
+        # small chunks, so lines are split between them
+        _chunks = [
+            _patch_buf[_i:_i + 4] for _i in range(0, len(_patch_buf), 4)
+        ]
+        self.assertEqual(
+            list(_futils.gunzip_lines(_chunks)),
+            ["fakecontent"],
+            "Incorrect lines returned by 'gunzip_lines'"
+        )
+        # concatenated gzip members read as one file
+        self.assertEqual(
+            list(_futils.gunzip_lines([_patch_buf, _patch_buf])),
+            ["fakecontent", "fakecontent"],
+            "Incorrect lines returned by 'gunzip_lines'"
+        )
+
+    def test_http_cache(self):
+        _m = self._try_import("cfg_checker.helpers.http_cache")
+        _hc = _m.helpers.http_cache
+        _cache_path = os.path.join(tests_dir, 'res', 'http.cache.json')
+        _sent = []
+
+        class MockResponse:
+            def __init__(self, status_code):
+                self.status_code = status_code
+                self.text = "fakepage" if status_code == 200 else ""
+                self.content = self.text.encode()
+                self.headers = {"ETag": "fake-etag"}
+
+        def _get(url, headers=None):
+            _sent.append(headers)
+            if headers and headers.get("If-None-Match") == "fake-etag":
+                return MockResponse(304)
+            return MockResponse(200)
+
+        _cache = _hc.HttpCache(_cache_path)
+        _r, _text = _cache.get(_get, "http://fake/", body=True)
+        self.assertEqual(_r.status_code, 200)
+        self.assertIsNone(_text)
+        _cache.save()
+
+        # new instance loads validators from disk
+        _cache = _hc.HttpCache(_cache_path)
+        _r, _text = _cache.get(_get, "http://fake/", body=True)
+        os.remove(_cache_path)
+        self.assertEqual(_sent[-1], {"If-None-Match": "fake-etag"})
+        self.assertEqual(_r.status_code, 304)
+        self.assertEqual(_text, "fakepage")
+        self.assertEqual(_cache.hits, 1)
+        # no conditional request when cached copy is not allowed
+        _r, _text = _cache.get(
+            _get,
+            "http://fake/",
+            conditional=False,
+            body=True
+        )
+        self.assertIsNone(_sent[-1])
+        self.assertEqual(_r.status_code, 200)
+
+    def test_kv_store(self):
+        _m = self._try_import("cfg_checker.helpers.kv_store")
+        _kv = _m.helpers.kv_store
+        _store = _kv.KVStore()
+        _folder = _store._folder
+        _text = "fake raw text\n" * 100
+        _store.put(("cmp01", "fakepackage"), _text)
+        _store.put(("cmp01", "fakepackage2"), "")
+        self.assertEqual(_store.get(("cmp01", "fakepackage")), _text)
+        self.assertEqual(_store.get(("cmp01", "fakepackage2")), "")
+        # keys are not mixed between nodes
+        self.assertIsNone(_store.get(("cmp02", "fakepackage")))
+        self.assertEqual(
+            _store.get(("cmp02", "fakepackage"), default=""),
+            ""
+        )
+        _store.close()
+        self.assertFalse(os.path.exists(_folder))
+        # second close does nothing
+        _store.close()
+
+    def test_tgz_file(self):
+        _m = self._try_import("cfg_checker.helpers.tgz")
+        _tgz = _m.helpers.tgz
+        _folder = tempfile.mkdtemp()
+        try:
+            # legacy tar.gz is migrated on first use
+            _legacy = os.path.join(_folder, "fake.tgz")
+            with tarfile.open(_legacy, "w:gz") as _tar:
+                _buf = b"fakecontent"
+                _info = tarfile.TarInfo("fake.json")
+                _info.size = len(_buf)
+                _tar.addfile(_info, io.BytesIO(_buf))
+            _arch = _tgz.TGZFile(os.path.join(_folder, "fake.zip"))
+            self.assertEqual(_arch.list_files(), ["fake.json"])
+            self.assertEqual(
+                _arch.get_file("fake.json", decode=True),
+                "fakecontent"
+            )
+            # replacing members keeps the last one only
+            self.assertFalse(_arch.add_file("fake.json", buf="new"))
+            for _idx in range(10):
+                _arch.add_file(
+                    "fake.json",
+                    buf="content {}".format(_idx),
+                    replace=True
+                )
+            _arch.add_file("other.json", buf="other")
+            self.assertEqual(_arch.list_files(), ["fake.json", "other.json"])
+            self.assertEqual(
+                _arch.get_file("fake.json", decode=True),
+                "content 9"
+            )
+            # changes made outside are picked up
+            with zipfile.ZipFile(_arch.basefile, "a") as _zf:
+                _zf.writestr("outside.json", "outside")
+            self.assertTrue(_arch.has_file("outside.json"))
+            self.assertFalse(_arch.has_file(_arch._labelname))
+        finally:
+            shutil.rmtree(_folder)
+
+    @mock.patch(_shell_salt_path, side_effect=mocked_shell)
+    @mock.patch('requests.Session.post', side_effect=mocked_salt_post)
+    def test_salt_token_cache(self, m_post, m_shell):
+        _m = self._try_import("cfg_checker.common.salt_utils")
+        _salt = _m.common.salt_utils
+        _token_file = _salt.config.salt_token_file
+
+        def _logins():
+            return len([
+                _c for _c in m_post.call_args_list
+                if _c[0][0].endswith("/login")
+            ])
+
+        def _save(**kwargs):
+            _cached["response"].update(kwargs)
+            with open(_token_file, "w") as _f:
+                json.dump(_cached, _f)
+
+        if os.path.exists(_token_file):
+            os.remove(_token_file)
+        # no token saved, login and save it for the owner only
+        _salt.SaltRest()
+        self.assertEqual(_logins(), 1)
+        self.assertEqual(os.stat(_token_file).st_mode & 0o777, 0o600)
+        with open(_token_file) as _f:
+            _cached = json.load(_f)
+        self.assertEqual(_cached["response"]["token"], "faketoken")
+
+        # token that is not expiring soon is reused with no login
+        _save(token="cachedtoken", expire=time.time() + 3600)
+        _rest = _salt.SaltRest()
+        self.assertEqual(_logins(), 1)
+        self.assertEqual(_rest._token, "cachedtoken")
+        self.assertEqual(
+            _rest.default_headers["X-Auth-Token"],
+            "cachedtoken"
+        )
+
+        # token expiring in less than 5 min is not used
+        _save(expire=time.time() + 60)
+        _salt.SaltRest()
+        self.assertEqual(_logins(), 2)
+
+        # token from other salt master is not used
+        _cached["uri"] = "http://other.master:6969"
+        _save(expire=time.time() + 3600)
+        _salt.SaltRest()
+        self.assertEqual(_logins(), 3)
+
+        # malformed files are replaced by a new token
+        _logins_count = _logins()
+        for _bad in [
+            "{",
+            "{}",
+            "[]",
+            '{"response": {"token": "cachedtoken"}}',
+            '{"response": {"expire": 1}}',
+            '{"response": {"expire": "tomorrow", "token": "cachedtoken"}}'
+        ]:
+            with open(_token_file, "w") as _f:
+                _f.write(_bad)
+            _rest = _salt.SaltRest()
+            _logins_count += 1
+            self.assertEqual(_logins(), _logins_count, _bad)
+            self.assertEqual(_rest._token, "faketoken", _bad)
+        with open(_token_file) as _f:
+            self.assertEqual(json.load(_f)["response"]["token"], "faketoken")
+        os.remove(_token_file)
+
+    @mock.patch(_shell_salt_path, side_effect=mocked_shell)
+    @mock.patch('requests.Session.post', side_effect=mocked_salt_post)
+    def test_salt_request_retry(self, m_post, m_shell):
+        _m = self._try_import("cfg_checker.common.salt_utils")
+        _salt = _m.common.salt_utils
+        _rest = _salt.SaltRest()
+        _rest._auth["response"]["expire"] = time.time() + 3600
+        _logins = m_post.call_count
+        _denied = MockResponse({}, 401)
+        _denied.ok = False
+
+        # revoked token, login again and retry once
+        with mock.patch.object(_rest, "get", side_effect=[
+            _denied,
+            MockResponse({"return": ["fakeresult"]}, 200)
+        ]) as _get:
+            self.assertEqual(
+                _rest.salt_request("get", path="minions"),
+                ["fakeresult"]
+            )
+        self.assertEqual(_get.call_count, 2)
+        self.assertEqual(m_post.call_count, _logins + 1)
+        self.assertTrue(m_post.call_args[0][0].endswith("/login"))
+
+        # still not authorized after login, no more retries
+        with mock.patch.object(_rest, "get", side_effect=[
+            _denied,
+            _denied
+        ]) as _get:
+            with self.assertRaises(EnvironmentError):
+                _rest.salt_request("get", path="minions")
+        self.assertEqual(_get.call_count, 2)
+        os.remove(_salt.config.salt_token_file)
+
+    @mock.patch(_shell_salt_path, side_effect=mocked_shell)
+    @mock.patch('requests.Session.post', side_effect=mocked_salt_post)
+    def test_salt_job_polling(self, m_post, m_shell):
+        _m = self._try_import("cfg_checker.common.salt_utils")
+        _remote = _m.common.salt_utils.SaltRemote()
+        _jid = "20990101000000000000"
+
+        def _poll(returns, running, minions=None):
+            if minions is not None:
+                _remote._jobs[_jid] = minions
+            with mock.patch.object(
+                _remote,
+                "lookup_jid",
+                side_effect=returns
+            ) as _lookup, mock.patch.object(
+                _remote,
+                "find_job",
+                side_effect=running
+            ) as _find:
+                _r = list(
+                    _remote.iter_jid_results(_jid, timeout=0, interval=0)
+                )
+            return _r, _lookup.call_count, _find.call_count
+
+        # results come across several polls, slow minions are waited for,
+        # returns are fetched only when some minions are done
+        _r, _lookups, _checks = _poll(
+            [{}, {"a": 1}, {"a": 1, "b": 2}, {"a": 1, "b": 2, "c": 3}],
+            [["a", "b", "c"], ["b", "c"], ["b", "c"], ["c"], []],
+            minions=["a", "b", "c"]
+        )
+        self.assertEqual(_r, [("a", 1), ("b", 2), ("c", 3)])
+        self.assertEqual((_lookups, _checks), (4, 5))
+
+        # minion that is not running the job is not waited for,
+        # but returns made before the check are taken
+        _r, _lookups, _checks = _poll(
+            [{"a": 1}, {"a": 1, "b": 2}],
+            [[]],
+            minions=["a", "b", "c"]
+        )
+        self.assertEqual(_r, [("a", 1), ("b", 2)])
+        self.assertEqual((_lookups, _checks), (2, 1))
+
+        # targeted minions are taken from master when not known
+        with mock.patch.object(
+            _remote,
+            "list_job",
+            return_value={"Minions": ["a", "b"]}
+        ):
+            _r, _lookups, _checks = _poll(
+                [{"a": 1}, {"a": 1, "b": 2}],
+                [["b"], []]
+            )
+        self.assertEqual(_r, [("a", 1), ("b", 2)])
+
+        # many minions returning in waves, all of the returns
+        # are not transferred on each poll
+        _minions = ["cmp{:03d}".format(_i) for _i in range(100)]
+        _polls = []
+
+        def _running(nodes, jid):
+            # a quarter of minions is done on each 5th poll
+            _polls.append(nodes)
+            _done = len(_polls) // 5 * 25
+            return [_m for _m in nodes if _m in _minions[_done:]]
+
+        def _returns(jid):
+            _done = len(_polls) // 5 * 25
+            return {_m: "fake" for _m in _minions[:_done]}
+
+        _r, _lookups, _checks = _poll(_returns, _running, minions=_minions)
+        self.assertEqual(sorted(_m for _m, _ in _r), _minions)
+        self.assertEqual(_checks, 20)
+        # first one and one per wave
+        self.assertEqual(_lookups, 5)
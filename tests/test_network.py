@@ -19,8 +19,8 @@ _fake_nerrors._error_logs_folder_name = "tests/res/fakeerrors"
 
 
 class TestNetworkModule(CfgCheckerTestBase):
-    @patch('requests.get', side_effect=mocked_salt_get)
-    @patch('requests.post', side_effect=mocked_salt_post)
+    @patch('requests.Session.get', side_effect=mocked_salt_get)
+    @patch('requests.Session.post', side_effect=mocked_salt_post)
     @patch(_shell_salt_path, side_effect=mocked_shell)
     @patch(_NErrors_path, new=_fake_nerrors)
     def test_network_list(self, m_get, m_post, m_shell):
@@ -37,8 +37,8 @@ class TestNetworkModule(CfgCheckerTestBase):
             "'mcp-net {}' command failed".format(" ".join(_args))
         )
 
-    @patch('requests.get', side_effect=mocked_salt_get)
-    @patch('requests.post', side_effect=mocked_salt_post)
+    @patch('requests.Session.get', side_effect=mocked_salt_get)
+    @patch('requests.Session.post', side_effect=mocked_salt_post)
     @patch(_shell_salt_path, side_effect=mocked_shell)
     @patch(_NErrors_path, new=_fake_nerrors)
     def test_network_map(self, m_get, m_post, m_shell):
@@ -57,8 +57,8 @@ class TestNetworkModule(CfgCheckerTestBase):
             "'mcp-net {}' command failed".format(" ".join(_args))
         )
 
-    @patch('requests.get', side_effect=mocked_salt_get)
-    @patch('requests.post', side_effect=mocked_salt_post)
+    @patch('requests.Session.get', side_effect=mocked_salt_get)
+    @patch('requests.Session.post', side_effect=mocked_salt_post)
     @patch(_shell_salt_path, side_effect=mocked_shell)
     @patch(_NErrors_path, new=_fake_nerrors)
     def test_network_check(self, m_get, m_post, m_shell):
@@ -77,8 +77,8 @@ class TestNetworkModule(CfgCheckerTestBase):
             "'mcp-net {}' command failed".format(" ".join(_args))
         )
 
-    @patch('requests.get', side_effect=mocked_salt_get)
-    @patch('requests.post', side_effect=mocked_salt_post)
+    @patch('requests.Session.get', side_effect=mocked_salt_get)
+    @patch('requests.Session.post', side_effect=mocked_salt_post)
     @patch(_shell_salt_path, side_effect=mocked_shell)
     @patch(_NErrors_path, new=_fake_nerrors)
     def test_network_report_html(self, m_get, m_post, m_shell):
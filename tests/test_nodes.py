@@ -0,0 +1,115 @@
+import json
+import os
+import time
+
+from unittest.mock import patch
+
+from tests.mocks import _compress_output
+from tests.mocks import mocked_salt_post, mocked_salt_get
+from tests.mocks import mocked_shell, _shell_salt_path
+from tests.test_base import CfgCheckerTestBase
+
+from cfg_checker.common import config
+from cfg_checker.common.const import NODE_UP, NODE_DOWN
+from cfg_checker.nodes import SaltNodes
+
+
+class TestNodes(CfgCheckerTestBase):
+    def _gather(self):
+        _nodes = SaltNodes()
+        _nodes.gather_node_info(None, None)
+        return _nodes
+
+    def _load_inventory(self):
+        with open(config.inventory_file) as _f:
+            return json.load(_f)
+
+    def _save_inventory(self, inventory):
+        with open(config.inventory_file, "w") as _f:
+            json.dump(inventory, _f)
+
+    @patch('requests.Session.get', side_effect=mocked_salt_get)
+    @patch('requests.Session.post', side_effect=mocked_salt_post)
+    @patch(_shell_salt_path, side_effect=mocked_shell)
+    def test_node_inventory(self, m_get, m_post, m_shell):
+        if os.path.exists(config.inventory_file):
+            os.remove(config.inventory_file)
+        self.addCleanup(os.remove, config.inventory_file)
+        with patch.object(config, "inventory_ttl", 600), \
+                patch.object(config, "refresh_inventory", False):
+            _nodes = self._gather()
+            _all = sorted(_nodes.nodes.keys())
+            _inventory = self._load_inventory()
+            _discovered = _inventory["timestamp"]
+            # releases are not cached
+            self.assertNotIn("mcp_release", _inventory)
+            self.assertEqual(sorted(_inventory["pillars"].keys()), _all)
+
+            # within TTL, no full discovery but all nodes are pinged
+            _salt = _nodes.salt
+            _down = _all[-1]
+            _up = _all[:-1]
+            with patch.object(_salt, "list_minions") as _list, \
+                    patch.object(
+                        _salt,
+                        "get_active_nodes",
+                        return_value=_up
+                    ) as _ping, \
+                    patch.object(
+                        _salt,
+                        "pillar_request_multi",
+                        wraps=_salt.pillar_request_multi
+                    ) as _pillars:
+                _nodes = self._gather()
+            _list.assert_not_called()
+            self.assertEqual(sorted(_ping.call_args[1]["nodes"]), _all)
+            self.assertEqual(_nodes.nodes[_down]["status"], NODE_DOWN)
+            self.assertEqual(_nodes.nodes[_up[0]]["status"], NODE_UP)
+            # only release pillars asked, node pillars are in inventory
+            self.assertEqual(
+                [_r[2] for _r in _pillars.call_args[0][0]],
+                ["_param:apt_mk_version", "_param:openstack_version"]
+            )
+            self.assertEqual(_nodes.mcp_release, "2099.0.0")
+            _inventory = self._load_inventory()
+            self.assertEqual(_inventory["timestamp"], _discovered)
+            self.assertEqual(sorted(_inventory["active"]), _up)
+
+            # node that is up again is not left down
+            _nodes = self._gather()
+            self.assertEqual(_nodes.nodes[_down]["status"], NODE_UP)
+
+            # expired inventory is collected again
+            _inventory["timestamp"] = time.time() - 600
+            self._save_inventory(_inventory)
+            with patch.object(
+                _salt,
+                "list_minions",
+                wraps=_salt.list_minions
+            ) as _list:
+                self._gather()
+            _list.assert_called_once_with()
+            self.assertGreater(
+                self._load_inventory()["timestamp"],
+                _discovered
+            )
+
+    def test_decode_script_output(self):
+        _text = '{"fakepackage": {"installed": "1.0"}}'
+        _packed = _compress_output(_text)
+        _decode = SaltNodes.decode_script_output
+        self.assertEqual(_decode("cmp01", _packed), _text)
+        # warnings from stderr before and after the payload
+        self.assertEqual(
+            _decode(
+                "cmp01",
+                "WARNING: fake warning\nDeprecated: fake\n" +
+                _packed +
+                "\nWARNING: fake warning after"
+            ),
+            _text
+        )
+        # not packed output is returned as is
+        self.assertEqual(_decode("cmp01", _text), _text)
+        self.assertIsNone(_decode("cmp01", None))
+        self.assertIsNone(_decode("cmp01", "#cfg-checker-gzip-b64 10 4\nfake"))
@@ -1,14 +1,22 @@
+import contextlib
+import io
+import json
 import os
+import runpy
+import shutil
+import tempfile
+import time
 
 from unittest.mock import patch
 
-from tests.mocks import mocked_package_get
+from tests.mocks import mocked_apt_popen, mocked_package_get
 from tests.mocks import mocked_salt_post, mocked_salt_get
 from tests.mocks import _res_dir
 from tests.mocks import mocked_shell, _shell_salt_path
 from tests.test_base import CfgCheckerTestBase
 
 from cfg_checker.modules.packages.repos import RepoManager, ReposInfo
+from cfg_checker.modules.packages.store import VersionStore
 
 
 # init fake module path
@@ -20,13 +28,35 @@ _fakeRepoManager = RepoManager(
     arch_folder=_res_dir,
     info_class=_fakeReposInfo
 )
+_fake_url = "http://fakedomain.com"
+_fake_tag = "2099.0.0"
 
 
 class TestPackageModule(CfgCheckerTestBase):
+    def _fake_repos_info(self, discovery="listing"):
+        # repos info for the fake tag in a folder removed after the test
+        _folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, _folder)
+        _ri = ReposInfo(arch_folder=_folder, discovery=discovery)
+        _ri.fetch_repos(_fake_url, tag=_fake_tag)
+        return _ri
+
+    def _fake_repo_manager(self, repos_info, fetch=True, **kwargs):
+        # manager sharing the folder with repos info
+        _rm = RepoManager(
+            arch_folder=repos_info._arch_folder,
+            info_class=repos_info,
+            **kwargs
+        )
+        if fetch:
+            _rm.fetch_versions(_fake_tag)
+        return _rm
+
     @patch('requests.get', side_effect=mocked_package_get)
+    @patch('requests.Session.get', side_effect=mocked_package_get)
     @patch(_ReposInfo_path, new=_fakeReposInfo)
     @patch(_RepoManager_path, new=_fakeRepoManager)
-    def test_build_repo_info(self, m_get):
+    def test_build_repo_info(self, m_session_get, m_get):
         # init arguments
         _args = [
             "versions",
@@ -52,9 +82,10 @@ class TestPackageModule(CfgCheckerTestBase):
         )
 
     @patch('requests.get', side_effect=mocked_package_get)
+    @patch('requests.Session.get', side_effect=mocked_package_get)
     @patch(_ReposInfo_path, new=_fakeReposInfo)
     @patch(_RepoManager_path, new=_fakeRepoManager)
-    def test_build_repo_info_for_tag(self, m_get):
+    def test_build_repo_info_for_tag(self, m_session_get, m_get):
         # init arguments
         _args = [
             "versions",
@@ -78,6 +109,269 @@ class TestPackageModule(CfgCheckerTestBase):
             "'mcp-pkg {}' command failed".format(" ".join(_args))
         )
 
+    @patch('requests.Session.get', side_effect=mocked_package_get)
+    def test_build_repo_info_from_release(self, m_get):
+        # both discovery modes should find the same repos
+        _infos = {}
+        for _mode in ["listing", "release"]:
+            _ri = self._fake_repos_info(discovery=_mode)
+            _infos[_mode] = _ri.get_repoinfo(_fake_tag)
+        self.assertTrue(
+            _infos["listing"]["all"]["ubuntu"],
+            "No repos found by listing mirror folders"
+        )
+        # content hashes are known only from Release files
+        for _repo in _infos["release"]["all"]["ubuntu"]:
+            self.assertEqual(len(_repo.pop("sha256")), 64)
+        self.assertEqual(
+            json.dumps(_infos["listing"], sort_keys=True),
+            json.dumps(_infos["release"], sort_keys=True),
+            "Repos found using Release files differ from listing"
+        )
+
+    @patch('requests.get', side_effect=mocked_package_get)
+    @patch('requests.Session.get', side_effect=mocked_package_get)
+    def test_refetch_unchanged_repos(self, m_session_get, m_get):
+        # second fetch of the same tag should not parse anything
+        _ri = self._fake_repos_info()
+        _rm = self._fake_repo_manager(_ri)
+        self.assertTrue(_rm._repo_hashes, "No repo hashes recorded")
+        _rm = self._fake_repo_manager(_ri, fetch=False)
+        with patch.object(
+            _rm,
+            "_merge_repo_packages",
+            wraps=_rm._merge_repo_packages
+        ) as _merge:
+            _rm.fetch_versions(_fake_tag)
+        self.assertFalse(
+            _merge.called,
+            "Unchanged repos parsed again"
+        )
+
+    @patch('requests.get', side_effect=mocked_package_get)
+    @patch('requests.Session.get', side_effect=mocked_package_get)
+    def test_parallel_fetch(self, m_session_get, m_get):
+        # download threads and parse processes give the same versions
+        _versions = []
+        for _fetch, _parse in [(1, 1), (2, 1), (2, 2)]:
+            _rm = self._fake_repo_manager(
+                self._fake_repos_info(),
+                fetch_workers=_fetch,
+                parse_workers=_parse
+            )
+            _versions.append((_rm._versions_mirantis, _rm._versions_other))
+        self.assertTrue(_versions[0][1], "No packages parsed")
+        self.assertEqual(_versions[1], _versions[0])
+        self.assertEqual(_versions[2], _versions[0])
+
+    def test_parallel_fetch_error(self):
+        # failed download stops the run instead of hanging it
+        from threading import Thread
+
+        from requests.exceptions import ConnectionError
+
+        with open(os.path.join(_res_dir, "Packages.gz"), "rb") as _f:
+            _data = _f.read()
+        _repos = [{"filepath": "fake{}".format(_i)} for _i in range(50)]
+
+        def _fetch(args):
+            _repo, _descriptions = args
+            if _repo is _repos[1]:
+                # let the other files fill all of the slots first
+                time.sleep(0.5)
+                raise ConnectionError("fake error")
+            return _data, _descriptions
+
+        for _workers in [2, 4]:
+            _folder = tempfile.mkdtemp()
+            self.addCleanup(shutil.rmtree, _folder)
+            _rm = RepoManager(
+                arch_folder=_folder,
+                info_class=_fakeReposInfo,
+                fetch_workers=_workers,
+                parse_workers=_workers
+            )
+            _errors = []
+
+            def _run():
+                try:
+                    for _pkg, _records in _rm._get_packages_for_repos(
+                        _repos,
+                        False
+                    ):
+                        list(_records)
+                except ConnectionError as e:
+                    _errors.append(e)
+
+            with patch.object(_rm, "_fetch_repo_file", side_effect=_fetch):
+                _t = Thread(target=_run, daemon=True)
+                _t.start()
+                _t.join(30)
+            self.assertFalse(
+                _t.is_alive(),
+                "Fetch with {} workers hangs on error".format(_workers)
+            )
+            self.assertEqual(len(_errors), 1)
+
+    def test_package_versions_workers(self):
+        for _option in [
+            "--crawl-workers",
+            "--fetch-workers",
+            "--parse-workers"
+        ]:
+            _args = ["versions", _option, "0"]
+            self.assertEqual(
+                self.run_cli("packages", _args),
+                1,
+                "'mcp-pkg {}' accepted no workers".format(" ".join(_args))
+            )
+
+    @patch('requests.get', side_effect=mocked_package_get)
+    @patch('requests.Session.get', side_effect=mocked_package_get)
+    def test_versions_store(self, m_session_get, m_get):
+        # sqlite store should give the same data as archive
+        _ri = self._fake_repos_info()
+        _tgz = self._fake_repo_manager(_ri)
+        # store left empty by a failed run
+        VersionStore(_tgz._store_file).close()
+        # versions are imported from archive on first use
+        _db = self._fake_repo_manager(_ri, fetch=False, store="sqlite")
+        self.assertTrue(_db.store_imported)
+        self.assertEqual(_db._versions_other, {})
+        # and only once
+        self.assertFalse(
+            self._fake_repo_manager(
+                _ri,
+                fetch=False,
+                store="sqlite"
+            ).store_imported
+        )
+        _names = _tgz.get_other_pkg_names()
+        self.assertTrue(_names, "No packages parsed")
+        self.assertEqual(_db.get_other_pkg_names(), _names)
+        for _name in _names:
+            self.assertEqual(
+                _db.get_package_versions(_name, tagged=True),
+                _tgz.get_package_versions(_name, tagged=True)
+            )
+            self.assertEqual(
+                _db.is_mirantis(_name, tag=_fake_tag),
+                _tgz.is_mirantis(_name, tag=_fake_tag)
+            )
+        # and exported back as is
+        _other = _tgz.versionstgz.get_file("other_v.json")
+        _db.versionstgz.add_file("other_v.json", "{}", replace=True)
+        _db.export_versions_store()
+        self.assertEqual(
+            _db.versionstgz.get_file("other_v.json"),
+            _other
+        )
+
+    @patch('requests.get', side_effect=mocked_package_get)
+    @patch('requests.Session.get', side_effect=mocked_package_get)
+    def test_lazy_versions(self, m_session_get, m_get):
+        # packages loaded on demand should be the same
+        _ri = self._fake_repos_info()
+        _full = self._fake_repo_manager(_ri)
+        # http cache is not loaded when nothing is downloaded
+        with patch(
+            "cfg_checker.modules.packages.repos.get_http_cache"
+        ) as _get_cache:
+            _info = ReposInfo(arch_folder=_ri._arch_folder)
+            self.assertTrue(_info.get_repoinfo(_fake_tag))
+            _lazy = self._fake_repo_manager(_ri, fetch=False, lazy=True)
+            self.assertEqual(_lazy._versions_other, {})
+            _names = _full.get_other_pkg_names()
+            self.assertEqual(_lazy.get_other_pkg_names(), _names)
+            for _name in _names:
+                self.assertEqual(
+                    _lazy.get_package_versions(_name),
+                    _full.get_package_versions(_name)
+                )
+        _get_cache.assert_not_called()
+        for _app in ["*", "-"]:
+            _rows = [
+                _rm.get_apps(_rm._get_app_versions("other", _app), _app)
+                for _rm in [_lazy, _full]
+            ]
+            self.assertEqual(_rows[0], _rows[1])
+        # cache and its index are written without leftovers
+        self.assertEqual(
+            sorted(
+                _f for _f in os.listdir(_ri._arch_folder)
+                if _f.startswith("versions.cache")
+            ),
+            ["versions.cache", "versions.cache.idx"]
+        )
+
+    @patch('requests.get', side_effect=mocked_package_get)
+    @patch('requests.Session.get', side_effect=mocked_package_get)
+    def test_release_versions(self, m_session_get, m_get):
+        # bulk search should find the same as filtered versions one by one
+        _ri = self._fake_repos_info()
+        _rm = self._fake_repo_manager(_ri)
+        _names = _rm.get_other_pkg_names()
+        self.assertTrue(_names, "No packages parsed")
+        _node = ("xenial", "amd64")
+        _releases = _rm.get_release_versions(
+            {_name: _node for _name in _names},
+            ["2099.1.0", _fake_tag],
+            "pike",
+            ["nightly"]
+        )
+        for _name in _names:
+            _r = _rm.get_filtered_versions(
+                _name,
+                tag=_fake_tag,
+                include=["pike", "xenial", "amd64"],
+                exclude=["nightly"]
+            )
+            if not _r:
+                _r = _rm.get_filtered_versions(
+                    _name,
+                    tag=_fake_tag,
+                    include=["xenial", "amd64"],
+                    exclude=["nightly", "openstack"]
+                )
+            _release = _rm._get_release_version(_r)
+            self.assertEqual(
+                _releases[_name]["r"].version,
+                _release["r"].version
+            )
+            self.assertEqual(_releases[_name]["repos"], _release["repos"])
+
+    @patch('requests.get', side_effect=mocked_package_get)
+    @patch('requests.Session.get', side_effect=mocked_package_get)
+    def test_maintainers_index(self, m_session_get, m_get):
+        # maintainer classes are saved along with versions
+        _ri = self._fake_repos_info()
+        _rm = self._fake_repo_manager(_ri)
+        self.assertTrue(_rm.versionstgz.has_file("pkgtags.json"))
+        _rm = self._fake_repo_manager(_ri, fetch=False)
+        _names = _rm.get_other_pkg_names()
+        self.assertTrue(_names, "No packages parsed")
+        for _name in _names:
+            self.assertIs(_rm.is_mirantis(_name), False)
+            self.assertIs(_rm.is_mirantis(_name, tag="2099"), False)
+            self.assertIsNone(_rm.is_mirantis(_name, tag="2098"))
+        for _name in _rm.get_mirantis_pkg_names():
+            self.assertIs(_rm.is_mirantis(_name, tag=_fake_tag), True)
+        self.assertIsNone(_rm.is_mirantis("no-such-package"))
+
+        # archive without the index is not changed by reading it
+        with patch(
+            "cfg_checker.modules.packages.repos._pkg_tags_filename",
+            "pkgtags.missing.json"
+        ):
+            _rm = self._fake_repo_manager(_ri, fetch=False)
+            with patch.object(_rm.versionstgz, "add_file") as _add:
+                for _name in _names:
+                    self.assertIs(_rm.is_mirantis(_name), False)
+            _add.assert_not_called()
+            # and the index is saved by the next fetch
+            _rm.fetch_versions(_fake_tag)
+            self.assertTrue(_rm.versionstgz.has_file("pkgtags.missing.json"))
+
     @patch('requests.get', side_effect=mocked_package_get)
     @patch(_ReposInfo_path, new=_fakeReposInfo)
     @patch(_RepoManager_path, new=_fakeRepoManager)
@@ -135,8 +429,8 @@ class TestPackageModule(CfgCheckerTestBase):
             "'mcp-pkg {}' command failed".format(" ".join(_args))
         )
 
-    @patch('requests.get', side_effect=mocked_salt_get)
-    @patch('requests.post', side_effect=mocked_salt_post)
+    @patch('requests.Session.get', side_effect=mocked_salt_get)
+    @patch('requests.Session.post', side_effect=mocked_salt_post)
     @patch(_ReposInfo_path, new=_fakeReposInfo)
     @patch(_RepoManager_path, new=_fakeRepoManager)
     @patch(_shell_salt_path, side_effect=mocked_shell)
@@ -157,8 +451,8 @@ class TestPackageModule(CfgCheckerTestBase):
             "'mcp-pkg {}' command failed".format(" ".join(_args))
         )
 
-    @patch('requests.get', side_effect=mocked_salt_get)
-    @patch('requests.post', side_effect=mocked_salt_post)
+    @patch('requests.Session.get', side_effect=mocked_salt_get)
+    @patch('requests.Session.post', side_effect=mocked_salt_post)
     @patch(_ReposInfo_path, new=_fakeReposInfo)
     @patch(_RepoManager_path, new=_fakeRepoManager)
     @patch(_shell_salt_path, side_effect=mocked_shell)
@@ -179,8 +473,8 @@ class TestPackageModule(CfgCheckerTestBase):
             "'mcp-pkg {}' command failed".format(" ".join(_args))
         )
 
-    @patch('requests.get', side_effect=mocked_salt_get)
-    @patch('requests.post', side_effect=mocked_salt_post)
+    @patch('requests.Session.get', side_effect=mocked_salt_get)
+    @patch('requests.Session.post', side_effect=mocked_salt_post)
     @patch(_ReposInfo_path, new=_fakeReposInfo)
     @patch(_RepoManager_path, new=_fakeRepoManager)
     @patch(_shell_salt_path, side_effect=mocked_shell)
@@ -201,6 +495,166 @@ class TestPackageModule(CfgCheckerTestBase):
             "'mcp-pkg {}' command failed".format(" ".join(_args))
         )
 
+    @patch('requests.Session.get', side_effect=mocked_salt_get)
+    @patch('requests.Session.post', side_effect=mocked_salt_post)
+    @patch(_ReposInfo_path, new=_fakeReposInfo)
+    @patch(_RepoManager_path, new=_fakeRepoManager)
+    @patch(_shell_salt_path, side_effect=mocked_shell)
+    def test_package_report_skipped_node(self, m_get, m_post, m_shell):
+        # skipped nodes have no linux attributes and no packages
+        from cfg_checker.common import config
+        from cfg_checker.common.const import NODE_SKIP
+        from cfg_checker.nodes import salt_master
+
+        _skipped = "cmp01.fakedomain.local"
+        _fake_report = os.path.join(_res_dir, "fake.html")
+        _args = ["report", "--html", _fake_report]
+        with patch.object(config, "skip_nodes", [_skipped]), \
+                patch.object(salt_master, "nodes", None), \
+                patch.object(salt_master, "skip_list", [], create=True), \
+                patch(
+                    "cfg_checker.modules.packages.checker.RepoManager",
+                    new=_fakeRepoManager
+                ):
+            _r_code = self.run_cli(
+                "packages",
+                _args
+            )
+            self.assertEqual(salt_master.nodes[_skipped]["status"], NODE_SKIP)
+        self.assertEqual(
+            _r_code,
+            0,
+            "'mcp-pkg {}' command failed".format(" ".join(_args))
+        )
+
+    def _raw_report_data(self):
+        return {
+            'critical': {},
+            'system': {},
+            'other': {
+                "fakepackage": {
+                    "results": {
+                        "fakestatus": {
+                            "fakeaction": {
+                                "cmp01": {},
+                                "cmp02": {}
+                            }
+                        }
+                    }
+                }
+            },
+            'unlisted': {}
+        }
+
+    def test_package_report_raw_texts(self):
+        from cfg_checker.helpers.kv_store import KVStore
+        from cfg_checker.modules.packages.checker import CloudPackageChecker
+
+        # no salt or repos needed to fill in raw texts
+        _checker = CloudPackageChecker.__new__(CloudPackageChecker)
+        _checker._raw_store = KVStore()
+        self.addCleanup(_checker._raw_store.close)
+        _checker._raw_store.put(("cmp01", "fakepackage"), "fake raw text")
+        _data = self._raw_report_data()
+        _checker._load_raw_for_report(_data)
+        _nodes = _data['other']["fakepackage"]["results"]["fakestatus"]
+        self.assertEqual(_nodes["fakeaction"]["cmp01"]['raw'], "fake raw text")
+        # node that returned nothing for the package
+        self.assertEqual(_nodes["fakeaction"]["cmp02"]['raw'], "")
+
+        # without collected packages there are no raw texts
+        _checker._raw_store = None
+        _data = self._raw_report_data()
+        _checker._load_raw_for_report(_data)
+        _nodes = _data['other']["fakepackage"]["results"]["fakestatus"]
+        self.assertEqual(_nodes["fakeaction"]["cmp01"]['raw'], "")
+
+    def test_package_report_raw_store_closed(self):
+        from cfg_checker.helpers.kv_store import KVStore
+        from cfg_checker.modules.packages.checker import CloudPackageChecker
+
+        _checker = CloudPackageChecker.__new__(CloudPackageChecker)
+        _checker._packages = {}
+        _checker._raw_store = None
+        _fake_report = os.path.join(_res_dir, "fake.html")
+        # no store to close
+        with patch.object(
+            CloudPackageChecker,
+            "presort_packages",
+            return_value=self._raw_report_data()
+        ), patch("cfg_checker.reports.reporter.ReportToFile.__call__"):
+            _checker.create_report(_fake_report, 'html')
+        # store is removed even when the report fails
+        _checker._raw_store = KVStore()
+        _folder = _checker._raw_store._folder
+        with patch.object(
+            CloudPackageChecker,
+            "presort_packages",
+            side_effect=ValueError("fake error")
+        ):
+            with self.assertRaises(ValueError):
+                _checker.create_report(_fake_report, 'html')
+        self.assertIsNone(_checker._raw_store)
+        self.assertFalse(os.path.exists(_folder))
+
+    def _run_pkg_versions(self, args):
+        from cfg_checker.common.settings import pkg_dir
+
+        _script = os.path.join(pkg_dir, 'scripts', 'pkg_versions.py')
+        _out = io.StringIO()
+        with self.save_arguments(), \
+                patch.dict("sys.modules", {"apt_pkg": None}), \
+                patch(
+                    "subprocess.Popen",
+                    side_effect=mocked_apt_popen
+                ) as _popen, \
+                contextlib.redirect_stdout(_out):
+            import sys
+            sys.argv = [_script] + args
+            runpy.run_path(_script, run_name="__main__")
+        return _out.getvalue(), _popen
+
+    def test_pkg_versions_script(self):
+        from cfg_checker.nodes import SaltNodes
+
+        _packed, _popen = self._run_pkg_versions(["--compress"])
+        _bulk = json.loads(SaltNodes.decode_script_output("cmp01", _packed))
+        _policy_calls = [
+            _c[0][0] for _c in _popen.call_args_list
+            if _c[0][0][:2] == ["apt-cache", "policy"]
+        ]
+        # 203 installed packages in two chunks, one asked alone
+        self.assertEqual(
+            [len(_c) - 2 for _c in _policy_calls],
+            [200, 3, 1]
+        )
+        self.assertEqual(_policy_calls[-1][2], "fakepackage-m")
+        self.assertEqual(len(_bulk), 203)
+        self.assertNotIn("fakepackage-removed", _bulk)
+        self.assertEqual(
+            _bulk["fakepackage"]["installed"],
+            "1.0-1~u16.04+mcp1"
+        )
+        self.assertEqual(
+            _bulk["fakepackage"]["candidate"],
+            "1.0-1~u16.04+mcp2"
+        )
+        self.assertTrue(
+            _bulk["fakepackage"]["raw"].startswith("fakepackage:\n")
+        )
+        self.assertNotIn("fakepackage-o:", _bulk["fakepackage"]["raw"])
+        # fallback result is the same as for a bulk one
+        self.assertEqual(_bulk["fakepackage-m"]["installed"], "3.0-1")
+        self.assertEqual(_bulk["fakepackage-m"]["candidate"], "(none)")
+        self.assertEqual(
+            _bulk["fakefiller199"]["installed"],
+            "2.0-1ubuntu1"
+        )
+
+        # one call per package gives the same
+        _out, _ = self._run_pkg_versions(["--per-package"])
+        self.assertEqual(json.loads(_out), _bulk)
+
     def test_package_cmp_result_class(self):
         from cfg_checker.common.const import VERSION_OK, VERSION_UP, \
             VERSION_DOWN, VERSION_WARN
@@ -321,3 +775,217 @@ class TestPackageModule(CfgCheckerTestBase):
         out = _vcmp(_i, _c, "")
         self.assertEqual(out.status, VERSION_UP, _b + _ws)
         self.assertEqual(out.action, ACT_NEED_DOWN, _b + _wa)
+
+    def test_package_cmp_result_signs(self):
+        # every order of installed, candidate and release versions
+        # gives the same result as the rich comparison chain before
+        from cfg_checker.common.const import VERSION_OK, VERSION_UP, \
+            VERSION_DOWN, VERSION_WARN
+        from cfg_checker.common.const import ACT_NA, ACT_UPGRADE, \
+            ACT_NEED_UP, ACT_NEED_DOWN, ACT_REPO
+
+        _name = "cfg_checker.modules.packages.versions.VersionCmpResult"
+        _message, _vcmp = self._safe_import_class(_name)
+        _name = "cfg_checker.modules.packages.versions.DebianVersion"
+        _message, dv = self._safe_import_class(_name)
+
+        # these version strings sort the same way as versions
+        _v0, _v1, _v2 = "1:1.0-1", "1:1.1-1", "1:1.1-2"
+        # installed, candidate, release, status, action, target
+        # for each of 13 signs of (i vs c, i vs r, c vs r)
+        _cases = [
+            (_v0, _v1, _v2, VERSION_WARN, ACT_REPO, _v1),
+            (_v0, _v1, _v1, VERSION_WARN, ACT_NEED_UP, _v1),
+            (_v0, _v2, _v1, VERSION_WARN, ACT_NEED_UP, _v1),
+            (_v0, _v1, _v0, VERSION_OK, ACT_UPGRADE, _v1),
+            (_v1, _v2, _v0, VERSION_UP, ACT_UPGRADE, _v2),
+            (_v0, _v0, _v1, VERSION_OK, ACT_REPO, _v1),
+            (_v0, _v0, _v0, VERSION_OK, ACT_NA, _v0),
+            (_v1, _v1, _v0, VERSION_WARN, ACT_REPO, _v1),
+            (_v1, _v0, _v2, VERSION_DOWN, ACT_REPO, _v2),
+            (_v1, _v0, _v1, VERSION_OK, ACT_REPO, _v0),
+            (_v2, _v0, _v1, VERSION_UP, ACT_REPO, _v0),
+            (_v1, _v0, _v0, VERSION_WARN, ACT_NEED_DOWN, _v0),
+            (_v2, _v1, _v0, VERSION_UP, ACT_NEED_DOWN, _v1),
+            (_v0, _v1, "", VERSION_OK, ACT_UPGRADE, _v1),
+            (_v0, _v0, "", VERSION_OK, ACT_NA, _v0),
+            (_v1, _v0, "", VERSION_UP, ACT_NEED_DOWN, _v0),
+        ]
+        self.assertEqual(
+            len(set(
+                (
+                    (_i > _c) - (_i < _c),
+                    (_i > _r) - (_i < _r),
+                    (_c > _r) - (_c < _r)
+                ) for _i, _c, _r, _, _, _ in _cases if _r
+            )),
+            13
+        )
+        for _i, _c, _r, _status, _action, _target in _cases:
+            _b = "i={}, c={}, r={}".format(_i, _c, _r)
+            out = _vcmp(dv(_i), dv(_c), dv(_r))
+            self.assertEqual(out.status, _status, _b + ": wrong status")
+            self.assertEqual(out.action, _action, _b + ": wrong action")
+            self.assertEqual(out.target.version, _target, _b + ": target")
+
+    def test_repo_index_duplicates(self):
+        from cfg_checker.modules.packages.repos import _get_value_index
+        from cfg_checker.modules.packages.repos import _reverse_index
+
+        def _forward_search(_di, value, header=None):
+            # index search as it was done before the reverse index
+            _index = None
+            for _k, _v in _di.items():
+                if header and _v["header"] == header:
+                    _index = _k
+                elif not header and _v == value:
+                    _index = _k
+            return _index
+
+        # archives made by older versions might have duplicates,
+        # keys are not always in order as well
+        _maintainers = {
+            "1": "Fake Maintainer <fake@fakedomain.com>",
+            "10": "Other Maintainer <other@fakedomain.com>",
+            "2": "Fake Maintainer <fake@fakedomain.com>",
+            "3": "Other Maintainer <other@fakedomain.com>"
+        }
+        _rev = _reverse_index(_maintainers)
+        for _value in set(_maintainers.values()):
+            self.assertEqual(
+                _get_value_index(_maintainers, _rev, _value),
+                _forward_search(_maintainers, _value)
+            )
+        _repos = {
+            "3": {"header": "fake_header", "props": {"tag": "2099.0.0"}},
+            "1": {"header": "other_header", "props": {"tag": "2099.0.0"}},
+            "2": {"header": "fake_header", "props": {"tag": "2099.1.0"}}
+        }
+        _rev = _reverse_index(_repos, header=True)
+        for _header in ["fake_header", "other_header"]:
+            self.assertEqual(
+                _get_value_index(_repos, _rev, {}, header=_header),
+                _forward_search(_repos, None, header=_header)
+            )
+        # new values are added to both indexes
+        _index = _get_value_index(_repos, _rev, {}, header="new_header")
+        self.assertEqual(_index, "4")
+        self.assertEqual(_repos[_index]["header"], "new_header")
+        self.assertEqual(
+            _get_value_index(_repos, _rev, {}, header="new_header"),
+            _index
+        )
+
+    def test_merge_repo_packages(self):
+        _folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, _folder)
+        _rm = RepoManager(arch_folder=_folder, info_class=_fakeReposInfo)
+        _props = {
+            "tag": "2099.0.0",
+            "subset": "openstack-pike",
+            "release": "xenial",
+            "ubuntu-release": "xenial",
+            "type": "main",
+            "arch": "amd64"
+        }
+        _pike = dict(_props)
+        _extra = dict(_props, subset="extra")
+        _mirantis = "Fake Maintainer <fake@mirantis.com>"
+        _other = "Other Maintainer <other@fakedomain.com>"
+        # name, version, md5, maintainer, section, app, arch, description
+        _pike_records = [
+            ("fakepackage", "1.0-1", "md5a", _mirantis, "net", "fakeapp",
+             "amd64", {}),
+            ("otherpackage", "2.0-1", "md5b", _other, "libs", "otherapp",
+             "amd64", {})
+        ]
+        _extra_records = [
+            ("fakepackage", "1.0-1", "md5a", _mirantis, "net", "fakeapp",
+             "all", {}),
+            ("otherpackage", "2.0-2", "md5c", _other, "libs", "otherapp",
+             "amd64", {})
+        ]
+        self.assertEqual(
+            _rm._merge_repo_packages(_pike, _pike_records, False, True),
+            (2, 2)
+        )
+        # only new package names are counted as new
+        self.assertEqual(
+            _rm._merge_repo_packages(_extra, _extra_records, False, True),
+            (2, 0)
+        )
+        _h_pike = _rm._create_repo_header(_pike)
+        _h_extra = _rm._create_repo_header(_extra)
+        self.assertNotEqual(_h_pike, _h_extra)
+        _fake = _rm._versions_mirantis["fakepackage"]
+        self.assertEqual(list(_fake.keys()), ["1.0-1"])
+        self.assertEqual(
+            sorted(_p.split('-')[0] for _p in _fake["1.0-1"]["md5a"]['repo']),
+            sorted([_h_pike, _h_extra])
+        )
+        _versions = _rm._versions_other["otherpackage"]
+        self.assertEqual(sorted(_versions.keys()), ["2.0-1", "2.0-2"])
+        self.assertEqual(_versions["2.0-1"]["md5b"]['section'], "libs")
+        self.assertEqual(_versions["2.0-2"]["md5c"]['app'], "otherapp")
+        self.assertNotIn("fakepackage", _rm._versions_other)
+        self.assertEqual(_rm._updated["mirantis"], {"fakepackage"})
+        self.assertEqual(_rm._updated["other"], {"otherpackage"})
+        # archs of the app are merged from both repos
+        self.assertEqual(
+            sorted(_rm._apps["net"]["fakeapp"]["fakepackage"]),
+            ["all", "amd64"]
+        )
+
+    def test_repo_header_tokens(self):
+        _folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, _folder)
+        _rm = RepoManager(arch_folder=_folder, info_class=_fakeReposInfo)
+        _props = {
+            "tag": "2099.0.0",
+            "subset": "openstack-pike",
+            "release": "xenial",
+            "ubuntu-release": "xenial",
+            "type": "main",
+            "arch": "amd64"
+        }
+        _pike = _rm._create_repo_header(_props)
+        _props.update({"subset": "extra", "arch": "i386"})
+        _extra = _rm._create_repo_header(_props)
+        self.assertEqual(
+            _rm._header_tokens["openstack-pike_xenial_xenial_main_amd64"],
+            frozenset(["openstack", "pike", "xenial", "main", "amd64"])
+        )
+        self.assertEqual(
+            _rm.get_matching_repos(["xenial"], ["extra"]),
+            {_pike}
+        )
+        self.assertEqual(
+            _rm.get_matching_repos(["xenial", "i386"], []),
+            {_extra}
+        )
+        self.assertEqual(_rm.get_matching_repos(["bionic"], []), set())
+
+    def test_package_version_interned(self):
+        from cfg_checker.common.const import VERSION_OK, VERSION_WARN
+
+        _name = "cfg_checker.modules.packages.versions.VersionCmpResult"
+        _message, _vcmp = self._safe_import_class(_name)
+        _name = "cfg_checker.modules.packages.versions.DebianVersion"
+        _message, dv = self._safe_import_class(_name)
+
+        # same strings share single parsed version
+        self.assertIs(dv("1:1.2-0u4"), dv("1:1.2-0u4"))
+        self.assertLess(dv("1.0.9-1"), dv("1.0.10-1"))
+        self.assertEqual(dv("1:1.2-0u4"), dv("1:1.2-0u4"))
+
+        # part statuses belong to comparison, not to shared version
+        _i = dv("1:1.2-0u4")
+        out_warn = _vcmp(_i, dv("1:1.2-0u4"), dv("1:1.3-0u4"))
+        out_ok = _vcmp(_i, dv("1:1.2-0u4"), dv("1:1.2-0u4"))
+        self.assertEqual(out_warn.upstream_status, VERSION_OK)
+        self.assertEqual(out_ok.upstream_status, VERSION_OK)
+        self.assertEqual(out_ok.epoch_status, VERSION_OK)
+        out_warn = _vcmp(_i, dv("1:1.1-0u4"), dv("1:1.1-0u4"))
+        self.assertEqual(out_warn.status, VERSION_WARN)
+        self.assertEqual(out_warn.upstream_status, VERSION_WARN)
+        self.assertEqual(out_ok.upstream_status, VERSION_OK)